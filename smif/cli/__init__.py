@@ -32,6 +32,10 @@ The sector model implementations can be installed independently of the model
 run configuration. The main_config.yaml file specifies which sector models
 should run, while each set of sector model config
 
+The readers and the modelling framework, with their numerical and geographic
+dependencies, are imported inside the commands which use them, so that
+argument parsing and commands like ``smif -V`` start quickly.
+
 """
 from __future__ import print_function
 import logging
@@ -43,13 +47,8 @@ import traceback
 from argparse import ArgumentParser
 
 import smif
-from smif.data_layer.load import dump
-from smif.data_layer.sos_model_config import SosModelReader
-from smif.data_layer.sector_model_config import SectorModelReader
 from smif.data_layer.validate import VALIDATION_ERRORS
 
-from smif.modelrun import ModelRunBuilder
-
 __author__ = "Will Usher, Tom Russell"
 __copyright__ = "Will Usher, Tom Russell"
 __license__ = "mit"
@@ -148,6 +147,9 @@ def run_model(args):
     """Runs the model specified in the args.model argument
 
     """
+    from smif.data_layer.load import dump
+    from smif.modelrun import ModelRunBuilder
+
     model_config = validate_config(args)
 
     try:
@@ -182,6 +184,8 @@ def validate_config(args):
         Parser arguments
 
     """
+    from smif.data_layer.sos_model_config import SosModelReader
+
     config_path = os.path.abspath(args.path)
 
     if not os.path.exists(config_path):
@@ -235,6 +239,8 @@ def path_to_abs(relative_root, path):
 def read_sector_model_data(config_basepath, config):
     """Read sector-specific data from the sector config folders
     """
+    from smif.data_layer.sector_model_config import SectorModelReader
+
     data = []
 
     for model_config in config:
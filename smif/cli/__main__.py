@@ -0,0 +1,7 @@
+"""Run the command line interface as ``python -m smif.cli``
+"""
+import sys
+
+from smif.cli import main
+
+main(sys.argv[1:])
@@ -5,8 +5,15 @@ and the names of the four source and destination spatio-temporal resolutions.
 
 The :meth:`~SpaceTimeConvertor.convert` method returns a new
 :class:`numpy.ndarray` for passing to a sector model.
+
+Where the same conversion is applied repeatedly, the
+:meth:`~SpaceTimeConvertor.get_operator` method returns a
+:class:`ConversionOperator` which holds the resolved coefficient matrices
+and can be called directly on each new array of data.
 """
 import logging
+from functools import partial
+
 import numpy as np
 
 from smif.convert.area import get_register as get_region_register
@@ -45,10 +52,14 @@ class SpaceTimeConvertor(object):
     def convert(self, data, from_spatial, to_spatial, from_temporal, to_temporal):
         """Convert the data from set of regions and intervals to another
 
+        Each conversion is applied to the whole array as a single matrix
+        product, so a stack of timesteps can be converted in one call.
+
         Parameters
         ----------
         data: numpy.ndarray
-            An array of values with dimensions regions x intervals
+            An array of values with dimensions regions x intervals, or
+            timesteps x regions x intervals
         from_spatial: str
             The name of the spatial resolution of the data
         to_spatial: str
@@ -61,7 +72,37 @@ class SpaceTimeConvertor(object):
         Returns
         -------
         numpy.ndarray
-            An array of data with dimensions regions x intervals
+            An array of data with dimensions regions x intervals, or
+            timesteps x regions x intervals
+        """
+        operator = self.get_operator(from_spatial, to_spatial, from_temporal, to_temporal)
+        return operator(data)
+
+    def get_operator(self, from_spatial, to_spatial, from_temporal, to_temporal,
+                     scale=1, aggregation='sum', offset=0):
+        """Compile the conversion from one set of regions and intervals to another
+
+        Parameters
+        ----------
+        from_spatial: str
+            The name of the spatial resolution of the data
+        to_spatial: str
+            The name of the required spatial resolution
+        from_temporal: str
+            The name of the temporal resolution of the data
+        to_temporal: str
+            The name of the required temporal resolution
+        scale: float, default=1
+            A factor applied to the converted values
+        aggregation: str, default='sum'
+            How values combine across resolutions, one of ``sum``, ``mean``,
+            ``max`` or ``min``
+        offset: float, default=0
+            A constant added to the converted values after scaling
+
+        Returns
+        -------
+        ConversionOperator
         """
         assert from_spatial in self.regions.names, \
             "Cannot convert from spatial resolution {}".format(from_spatial)
@@ -72,43 +113,144 @@ class SpaceTimeConvertor(object):
         assert to_temporal in self.intervals.names, \
             "Cannot convert to temporal resolution {}".format(to_temporal)
 
-        if from_spatial != to_spatial and from_temporal != to_temporal:
-            converted = self._convert_regions(
-                self._convert_intervals(
-                    data,
-                    from_temporal,
-                    to_temporal
-                ),
-                from_spatial,
-                to_spatial
-            )
-        elif from_temporal != to_temporal:
-            converted = self._convert_intervals(
-                data,
-                from_temporal,
-                to_temporal
-            )
-        elif from_spatial != to_spatial:
-            converted = self._convert_regions(
-                data,
-                from_spatial,
-                to_spatial
-            )
+        if from_spatial != to_spatial:
+            spatial = self.regions.get_coefficients(from_spatial, to_spatial,
+                                                    aggregation)
         else:
-            converted = data
+            spatial = None
 
-        return converted
+        if from_temporal != to_temporal:
+            temporal = self.intervals.get_coefficients(from_temporal, to_temporal,
+                                                       aggregation)
+        else:
+            temporal = None
+
+        return ConversionOperator(spatial, temporal, scale, aggregation, offset)
 
-    def _convert_regions(self, data, from_spatial, to_spatial):
-        """Slice, convert and compose regions
-        """
-        converted = np.apply_along_axis(self.regions.convert, 0, data,
-                                        from_spatial, to_spatial)
-        return converted
 
-    def _convert_intervals(self, data, from_temporal, to_temporal):
-        """Slice, convert and compose intervals
+class ConversionOperator(object):
+    """A conversion between two spatio-temporal resolutions, resolved once and
+    applied to many arrays of data
+
+    Arguments
+    ---------
+    spatial: scipy.sparse.spmatrix, default=None
+        Matrix with dimensions to_regions x from_regions, or None if no
+        spatial conversion is required
+    temporal: scipy.sparse.spmatrix, default=None
+        Matrix with dimensions to_intervals x from_intervals, or None if no
+        temporal conversion is required
+    scale: float, default=1
+        A factor applied to the converted values
+    aggregation: str, default='sum'
+        For ``sum`` or ``mean``, the matrices are multiplied into the data.
+        For ``max`` or ``min``, the matrices mark the overlapping entries to
+        reduce over.
+    offset: float, default=0
+        A constant added to the converted values after scaling, such as
+        for conversion between temperature scales
+    """
+    def __init__(self, spatial=None, temporal=None, scale=1, aggregation='sum',
+                 offset=0):
+        self.spatial = spatial
+        self.temporal = temporal
+        self.scale = scale
+        self.aggregation = aggregation
+        self.offset = offset
+
+    def __call__(self, data):
+        """Convert an array of data
+
+        Arguments
+        ---------
+        data: numpy.ndarray
+            An array of values with dimensions regions x intervals, or
+            timesteps x regions x intervals
+
+        Returns
+        -------
+        numpy.ndarray
         """
-        converted = np.apply_along_axis(self.intervals.convert, 1, data,
-                                        from_temporal, to_temporal)
+        if self.aggregation == 'max':
+            apply = partial(_reduce_along_axis, np.maximum)
+        elif self.aggregation == 'min':
+            apply = partial(_reduce_along_axis, np.minimum)
+        else:
+            apply = _dot_along_axis
+
+        converted = data
+        if self.temporal is not None:
+            converted = apply(self.temporal, converted, -1)
+        if self.spatial is not None:
+            converted = apply(self.spatial, converted, -2)
+        if self.scale != 1 or self.offset != 0:
+            # scale in place, copying only where the array is the caller's
+            # own or cannot hold floats
+            if converted is data or converted.dtype.kind != 'f':
+                converted = np.array(converted, dtype=float)
+            if self.scale != 1:
+                converted *= self.scale
+            if self.offset != 0:
+                converted += self.offset
         return converted
+
+
+def _dot_along_axis(coefficients, data, axis):
+    """Multiply a (sparse) coefficient matrix into one axis of an array
+
+    Arguments
+    ---------
+    coefficients: scipy.sparse.spmatrix
+        A matrix with dimensions to_entries x from_entries
+    data: numpy.ndarray
+        An array with from_entries along `axis`
+    axis: int
+        The axis of `data` to convert
+
+    Returns
+    -------
+    numpy.ndarray
+        An array with to_entries along `axis`
+    """
+    data = np.moveaxis(np.asarray(data), axis, 0)
+    shape = data.shape
+    converted = coefficients.dot(data.reshape(shape[0], -1))
+    converted = converted.reshape((coefficients.shape[0],) + shape[1:])
+    return np.moveaxis(converted, 0, axis)
+
+
+def _reduce_along_axis(ufunc, pattern, data, axis):
+    """Reduce the entries of one axis of an array over the entries marked in
+    each row of a sparse pattern
+
+    Arguments
+    ---------
+    ufunc: numpy.ufunc
+        A reduction such as :func:`numpy.maximum`
+    pattern: scipy.sparse.csr_matrix
+        A matrix with dimensions to_entries x from_entries, whose stored
+        entries mark the from_entries to reduce into each to_entry
+    data: numpy.ndarray
+        An array with from_entries along `axis`
+    axis: int
+        The axis of `data` to convert
+
+    Returns
+    -------
+    numpy.ndarray
+        An array with to_entries along `axis`, which is zero where a to_entry
+        overlaps none of the from_entries
+    """
+    data = np.moveaxis(np.asarray(data), axis, 0)
+    shape = data.shape
+    flat = data.reshape(shape[0], -1)
+
+    converted = np.zeros((pattern.shape[0], flat.shape[1]), dtype=flat.dtype)
+    counts = np.diff(pattern.indptr)
+    rows = counts > 0
+    if rows.any():
+        values = flat[pattern.indices]
+        converted[rows] = ufunc.reduceat(values, pattern.indptr[:-1][rows], axis=0)
+
+    converted = converted.reshape((pattern.shape[0],) + shape[1:])
+    return np.moveaxis(converted, 0, axis)
@@ -1,18 +1,32 @@
 """Handles conversion between the sets of regions used in the `SosModel`
 """
 import logging
+import sys
 from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha1
 
 import numpy as np
 from rtree import index
+from scipy.sparse import csr_matrix
+from shapely import wkb
 from shapely.geometry import shape
 
 from smif.convert.register import Register, ResolutionSet
 
+try:
+    # shapely>=2 provides vectorised geometry functions over arrays
+    from shapely import STRtree, area, intersection
+except ImportError:
+    STRtree = None
+
 __author__ = "Will Usher, Tom Russell"
 __copyright__ = "Will Usher, Tom Russell"
 __license__ = "mit"
 
+# process pools can run an initializer in each worker from Python 3.7
+_POOL_INITIALIZER = sys.version_info >= (3, 7)
+
 
 def proportion_of_a_intersecting_b(shape_a, shape_b):
     """Calculate the proportion of shape a that intersects with shape b
@@ -21,6 +35,137 @@ def proportion_of_a_intersecting_b(shape_a, shape_b):
     return intersection.area / shape_a.area
 
 
+def intersection_coefficients(from_shapes, intersecting, to_shapes, offset=0):
+    """Calculate the proportion of each from_shape intersecting each to_shape
+
+    Arguments
+    ---------
+    from_shapes: list
+        A list of shapely geometries
+    intersecting: func
+        Called with the bounds of a to_shape, returns the positions of the
+        candidate from_shapes which may intersect with it
+    to_shapes: list
+        A list of shapely geometries
+    offset: int, default=0
+        The position of the first of the to_shapes in the full set of regions
+
+    Returns
+    -------
+    tuple
+        Lists of to_region positions, from_region positions and proportions
+    """
+    rows, cols, values = [], [], []
+
+    for to_idx, to_shape in enumerate(to_shapes, offset):
+        for from_idx in intersecting(to_shape.bounds):
+            proportion = proportion_of_a_intersecting_b(from_shapes[from_idx], to_shape)
+            rows.append(to_idx)
+            cols.append(from_idx)
+            values.append(proportion)
+
+    return rows, cols, values
+
+
+def bulk_intersection_coefficients(from_shapes, to_shapes, offset=0, tree=None):
+    """Calculate the proportion of each from_shape intersecting each to_shape
+    using vectorised geometry operations
+
+    Candidate pairs are found with a single STRtree query, then all
+    intersections and areas are computed in a few array calls. Requires
+    shapely>=2.
+
+    Arguments
+    ---------
+    from_shapes: list
+        A list of shapely geometries
+    to_shapes: list
+        A list of shapely geometries
+    offset: int, default=0
+        The position of the first of the to_shapes in the full set of regions
+    tree: shapely.STRtree, default=None
+        An index already built over the from_shapes, built here if None
+
+    Returns
+    -------
+    tuple
+        Arrays of to_region positions, from_region positions and proportions
+
+    Raises
+    ------
+    ZeroDivisionError
+        If a from_shape which may intersect a to_shape has zero area, as for
+        :func:`proportion_of_a_intersecting_b`
+    """
+    if tree is None:
+        tree = STRtree(np.array(from_shapes, dtype=object))
+    from_geometries = tree.geometries
+    to_geometries = np.array(to_shapes, dtype=object)
+
+    to_idx, from_idx = tree.query(to_geometries)
+
+    overlap = area(intersection(from_geometries[from_idx], to_geometries[to_idx]))
+    from_areas = area(from_geometries[from_idx])
+    if np.any(from_areas == 0):
+        empty = np.unique(from_idx[from_areas == 0])
+        msg = "Cannot apportion from regions with zero area, at positions {}"
+        raise ZeroDivisionError(msg.format(empty.tolist()))
+    return to_idx + offset, from_idx, overlap / from_areas
+
+
+def _coefficient_triplets(from_shapes, intersecting, to_shapes, offset=0):
+    """Calculate coefficients with the vectorised path if available,
+    otherwise pair by pair
+    """
+    if STRtree is not None:
+        return bulk_intersection_coefficients(from_shapes, to_shapes, offset)
+    return intersection_coefficients(from_shapes, intersecting, to_shapes, offset)
+
+
+"""Spatially indexed from_shapes, set once in each worker process of a
+parallel coefficient calculation
+"""
+_WORKER_REGIONS = None
+
+
+def _init_intersection_worker(from_wkbs):
+    """Load the from_shapes passed as WKB into a worker process and index them
+
+    The index is an STRtree if available, queried by every chunk the worker
+    calculates, otherwise an rtree index.
+    """
+    global _WORKER_REGIONS
+    from_shapes = [wkb.loads(geometry) for geometry in from_wkbs]
+    if STRtree is not None:
+        idx = STRtree(np.array(from_shapes, dtype=object))
+    else:
+        idx = index.Index()
+        for pos, from_shape in enumerate(from_shapes):
+            idx.insert(pos, from_shape.bounds)
+    _WORKER_REGIONS = (from_shapes, idx)
+
+
+def _intersect_chunk(to_wkbs, offset):
+    """Calculate the coefficients for a chunk of to_shapes passed as WKB
+    """
+    from_shapes, idx = _WORKER_REGIONS
+    to_shapes = [wkb.loads(geometry) for geometry in to_wkbs]
+    if STRtree is not None:
+        return bulk_intersection_coefficients(from_shapes, to_shapes, offset, tree=idx)
+    return intersection_coefficients(from_shapes,
+                                     lambda bounds: list(idx.intersection(bounds)),
+                                     to_shapes,
+                                     offset)
+
+
+def _intersect_chunk_with(from_wkbs, to_wkbs, offset):
+    """Load the from_shapes and calculate the coefficients for one chunk, in
+    pools which cannot load the from_shapes once in each worker
+    """
+    _init_intersection_worker(from_wkbs)
+    return _intersect_chunk(to_wkbs, offset)
+
+
 NamedShape = namedtuple('NamedShape', ['name', 'shape'])
 
 
@@ -61,6 +206,8 @@ class RegionSet(ResolutionSet):
     @data.setter
     def data(self, value):
         self._regions = []
+        self._digest = None
+        self._areas = None
         names = {}
         for region in value:
             name = region['properties']['name']
@@ -75,6 +222,30 @@ class RegionSet(ResolutionSet):
                 )
             )
 
+    @property
+    def digest(self):
+        """A hash of the region names and geometries
+        """
+        if self._digest is None:
+            digest = sha1()
+            for region in self._regions:
+                digest.update(str(region.name).encode('utf-8'))
+                digest.update(region.shape.wkb)
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    @property
+    def areas(self):
+        """The area of each region
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        if self._areas is None:
+            self._areas = np.array([region.shape.area for region in self._regions])
+        return self._areas
+
     def get_entry_names(self):
         return [region.name for region in self.data]
 
@@ -83,6 +254,11 @@ class RegionSet(ResolutionSet):
         """
         return [self._regions[pos] for pos in self._idx.intersection(bounds)]
 
+    def intersection_positions(self, bounds):
+        """Return the positions of the regions intersecting with a bounding box
+        """
+        return list(self._idx.intersection(bounds))
+
     def __getitem__(self, key):
         return self._regions[key]
 
@@ -93,10 +269,17 @@ class RegionSet(ResolutionSet):
 class RegionRegister(Register):
     """Holds the sets of regions used by the SectorModels and provides conversion
     between data values relating to compatible sets of regions.
+
+    Attributes
+    ----------
+    processes: int, default=None
+        If greater than one, the number of worker processes across which to
+        split the polygon intersections when computing conversion coefficients
     """
     def __init__(self):
         self._register = OrderedDict()
         self._conversions = defaultdict(dict)
+        self.processes = None
         self.logger = logging.getLogger(__name__)
 
     @property
@@ -128,15 +311,15 @@ class RegionRegister(Register):
 
     def register(self, region_set):
         """Register a set of regions as a source/target for conversion
+
+        Conversion coefficients are not computed here, but on the first
+        conversion between each pair of region sets.
         """
         if region_set.name in self._register:
             msg = "A region set named {} has already been loaded"
             raise ValueError(msg.format(region_set.name))
 
-        already_registered = self.names
         self._register[region_set.name] = region_set
-        for other_set_name in already_registered:
-            self._generate_coefficients(region_set, self._register[other_set_name])
 
     def convert(self, data, from_set_name, to_set_name):
         """Convert a list of data points for a given set of regions
@@ -149,52 +332,99 @@ class RegionRegister(Register):
         to_set_name: str
 
         """
-        from_set = self.get_entry(from_set_name)
-        from_set_names = from_set.get_entry_names()
-        to_set = self.get_entry(to_set_name)
-        to_set_names = to_set.get_entry_names()
+        coefficients = self.get_coefficients(from_set_name, to_set_name)
+        return coefficients.dot(data)
 
-        converted = np.zeros(len(to_set))
-        coefficents = self._conversions[from_set.name][to_set.name]
+    def get_coefficients(self, from_set_name, to_set_name, aggregation='sum'):
+        """Return the matrix which converts data between two sets of regions
 
-        for from_region_name, from_value in zip(from_set_names, data):
-            for to_region_name, coef in coefficents[from_region_name]:
-                to_region_idx = to_set_names.index(to_region_name)
-                converted[to_region_idx] += coef*from_value
+        The matrix is computed the first time a pair of region sets is
+        requested for each kind of aggregation and cached for subsequent
+        conversions. Coefficients other than ``sum`` are derived from those
+        for ``sum``, weighted by the intersection areas.
 
-        return converted
-
-    def _generate_coefficients(self, set_a, set_b):
-        # from a to b
-        self._conversions[set_a.name][set_b.name] = self._conversion_coefficients(set_a, set_b)
-        # from b to a
-        self._conversions[set_b.name][set_a.name] = self._conversion_coefficients(set_b, set_a)
+        Parameters
+        ----------
+        from_set_name: str
+        to_set_name: str
+        aggregation: str, default='sum'
+            One of ``sum``, ``mean``, ``max`` or ``min``
 
-    @staticmethod
-    def _conversion_coefficients(from_set, to_set):
-        """Return a dict containing the proportions of to_regions intersecting
-        with each given from_region::
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            A sparse matrix with dimensions to_regions x from_regions
+        """
+        from_set = self.get_entry(from_set_name)
+        to_set = self.get_entry(to_set_name)
 
-            {
-                from_region.name: [
-                    (to_region.name, proportion),
-                    # ...
-                ],
-                # ...
-            }
+        conversions = self._conversions[from_set.name]
+        if to_set.name not in conversions:
+            self.logger.debug("Computing conversion coefficients from %s to %s",
+                              from_set.name, to_set.name)
+            conversions[to_set.name] = self._load_or_compute_coefficients(
+                from_set, to_set, self._conversion_coefficients)
+        if aggregation == 'sum':
+            return conversions[to_set.name]
 
-        """
-        coefficients = defaultdict(list)
+        key = (to_set.name, aggregation)
+        if key not in conversions:
+            overlap = conversions[to_set.name].multiply(from_set.areas)
+            conversions[key] = self._aggregation_coefficients(overlap, aggregation)
+        return conversions[key]
 
-        for to_region in to_set:
-            intersecting_from_regions = from_set.intersection(to_region.shape.bounds)
+    def _conversion_coefficients(self, from_set, to_set):
+        """Return a sparse matrix containing the proportions of each from_region
+        intersecting with each to_region, indexed by region position::
 
-            for from_region in intersecting_from_regions:
-                proportion = proportion_of_a_intersecting_b(from_region.shape, to_region.shape)
-                coefficient_pair = (to_region.name, proportion)
-                coefficients[from_region.name].append(coefficient_pair)
+            coefficients[to_region_idx, from_region_idx] = proportion
 
-        return coefficients
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            A sparse matrix with dimensions to_regions x from_regions
+        """
+        if self.processes is not None and self.processes > 1 and len(to_set) > 1:
+            rows, cols, values = self._parallel_intersection_coefficients(from_set, to_set)
+        else:
+            rows, cols, values = _coefficient_triplets(
+                [region.shape for region in from_set],
+                from_set.intersection_positions,
+                [region.shape for region in to_set])
+
+        return csr_matrix((values, (rows, cols)), shape=(len(to_set), len(from_set)))
+
+    def _parallel_intersection_coefficients(self, from_set, to_set):
+        """Split the to_regions into chunks and intersect each chunk with the
+        from_regions in a pool of worker processes
+
+        Geometries are passed to the workers as WKB, and the from_regions are
+        sent once to each worker rather than with every chunk, except before
+        Python 3.7, where pools take no initializer.
+        """
+        from_wkbs = [region.shape.wkb for region in from_set]
+        to_wkbs = [region.shape.wkb for region in to_set]
+        chunk_size = -(-len(to_wkbs) // (self.processes * 4))
+        offsets = range(0, len(to_wkbs), chunk_size)
+
+        self.logger.debug("Intersecting %s with %s in %s chunks over %s processes",
+                          from_set.name, to_set.name, len(offsets), self.processes)
+
+        chunks = [to_wkbs[offset:offset + chunk_size] for offset in offsets]
+        if _POOL_INITIALIZER:
+            with ProcessPoolExecutor(max_workers=self.processes,
+                                     initializer=_init_intersection_worker,
+                                     initargs=(from_wkbs,)) as executor:
+                partials = list(executor.map(_intersect_chunk, chunks, offsets))
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                partials = list(executor.map(_intersect_chunk_with,
+                                             [from_wkbs] * len(chunks), chunks, offsets))
+
+        rows, cols, values = zip(*partials)
+        return (np.concatenate(rows).astype(int),
+                np.concatenate(cols).astype(int),
+                np.concatenate(values).astype(float))
 
 
 __REGISTER = RegionRegister()
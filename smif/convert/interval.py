@@ -4,8 +4,8 @@ There are three main classes, which are currently rather intertwined.
 :class:`Interval` represents an individual definition of a period
 within a year.
 This is specified using the ISO8601 period syntax and exposes
-methods which use the isodate library to parse this into an internal hourly
-representation of the period.
+methods which use the isodate library to parse this into an internal
+representation of the period in seconds.
 
 :class:`TimeIntervalRegister` holds the definitions of time-interval sets
 specified for the sector models at the :class:`~smif.sos_model.SosModel`
@@ -121,6 +121,12 @@ To::
 
         Feb: £870/GWh
 
+Conversion of each model input or output follows the ``aggregation`` of its
+:class:`~smif.metadata.Metadata`: ``sum`` divides and accumulates quantities,
+``mean`` fills and averages prices, weighted by the length of the overlap
+between intervals, and ``max`` or ``min`` take the extreme of the overlapping
+values.
+
 Development Notes
 -----------------
 
@@ -131,9 +137,11 @@ Development Notes
 import logging
 from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
+from hashlib import sha1
 
 import numpy as np
 from isodate import parse_duration
+from scipy.sparse import csr_matrix
 
 from smif.convert.register import Register, ResolutionSet
 
@@ -146,6 +154,61 @@ __license__ = "mit"
 """
 BASE_YEAR = 2010
 
+"""Number of seconds in the (non-leap) year spanned by the time slots
+"""
+SECONDS_IN_YEAR = 8760 * 3600
+
+"""Memo of ISO8601 duration strings already converted to seconds, keyed by
+(duration, base_year)
+"""
+_DURATION_SECONDS = {}
+
+
+def duration_to_seconds(duration, base_year=BASE_YEAR):
+    """Convert an ISO8601 duration into seconds elapsed since the start of the year
+
+    Results are memoised, so each distinct duration string is only parsed once.
+
+    Parameters
+    ----------
+    duration: str
+        A valid ISO8601 duration definition string
+    base_year: int, default=2010
+        The reference year used to resolve durations of months or years
+
+    Returns
+    -------
+    int
+        The second in the year associated with the duration
+    """
+    key = (duration, base_year)
+    if key not in _DURATION_SECONDS:
+        parsed_duration = parse_duration(duration)
+        if not isinstance(parsed_duration, timedelta):
+            reference = datetime(base_year, 1, 1, 0)
+            parsed_duration = parsed_duration.totimedelta(reference)
+        _DURATION_SECONDS[key] = parsed_duration.days * 86400 + parsed_duration.seconds
+    return _DURATION_SECONDS[key]
+
+
+def duration_to_hours(duration, base_year=BASE_YEAR):
+    """Convert an ISO8601 duration into whole hours elapsed since the start of
+    the year
+
+    Parameters
+    ----------
+    duration: str
+        A valid ISO8601 duration definition string
+    base_year: int, default=2010
+        The reference year used to resolve durations of months or years
+
+    Returns
+    -------
+    int
+        The hour in the year associated with the duration
+    """
+    return duration_to_seconds(duration, base_year) // 3600
+
 
 class Interval(object):
     """A time interval
@@ -194,10 +257,14 @@ class Interval(object):
             msg = "Interval tuple must take form (<start>, <end>)"
             raise ValueError(msg)
 
+        self._seconds = None
+        self._hours = None
         self._validate()
 
     def _validate(self):
-        for lower, upper in self.to_hours():
+        self._seconds = self._compute_seconds()
+        self._hours = (self._seconds // 3600).astype(np.int32)
+        for lower, upper in self._seconds.tolist():
             if lower > upper:
                 msg = "A time interval must not end before it starts - found %d > %d"
                 raise ValueError(msg, lower, upper)
@@ -294,6 +361,42 @@ class Interval(object):
         else:
             return False
 
+    @property
+    def hours(self):
+        """The start and end hours of each of the interval(s)
+
+        Computed once when the interval is defined and recomputed whenever
+        intervals are added.
+
+        Returns
+        -------
+        numpy.ndarray
+            An integer array with dimensions ranges x 2, with one (start, end)
+            row for each of the sorted intervals
+        """
+        return self._hours
+
+    @property
+    def seconds(self):
+        """The start and end seconds of each of the interval(s)
+
+        Unlike :py:attr:`hours`, this keeps any minutes and seconds of the
+        interval definitions.
+
+        Returns
+        -------
+        numpy.ndarray
+            An integer array with dimensions ranges x 2, with one (start, end)
+            row for each of the sorted intervals
+        """
+        return self._seconds
+
+    def _compute_seconds(self):
+        seconds = [(duration_to_seconds(start, self._baseyear),
+                    duration_to_seconds(end, self._baseyear))
+                   for start, end in self.interval]
+        return np.array(seconds, dtype=np.int64).reshape(-1, 2)
+
     def to_hours(self):
         """Return a list of tuples of the intervals in terms of hours
 
@@ -304,12 +407,7 @@ class Interval(object):
             of the interval
 
         """
-        hours = []
-        for start_interval, end_interval in self.interval:
-            start = self._convert_to_hours(start_interval)
-            end = self._convert_to_hours(end_interval)
-            hours.append((start, end))
-        return hours
+        return [(start, end) for start, end in self._hours.tolist()]
 
     def _convert_to_hours(self, duration):
         """
@@ -325,25 +423,7 @@ class Interval(object):
             The hour in the year associated with the duration
 
         """
-        reference = datetime(self._baseyear, 1, 1, 0)
-        parsed_duration = parse_duration(duration)
-        if isinstance(parsed_duration, timedelta):
-            hours = parsed_duration.days * 24 + \
-                    parsed_duration.seconds // 3600
-        else:
-            time = parsed_duration.totimedelta(reference)
-            hours = time.days * 24 + time.seconds // 3600
-        return hours
-
-    def to_hourly_array(self):
-        """Converts a list of intervals to a boolean array of hours
-
-        """
-        array = np.zeros(8760, dtype=np.int)
-        list_of_tuples = self.to_hours()
-        for lower, upper in list_of_tuples:
-            array[lower:upper] += 1
-        return array
+        return duration_to_hours(duration, self._baseyear)
 
 
 class IntervalSet(ResolutionSet):
@@ -392,19 +472,143 @@ class IntervalSet(ResolutionSet):
                                            interval_tuple,
                                            self._base_year)
         self._data = intervals
+        self._digest = None
+        self._build_slot_arrays()
         self._validate_intervals()
 
-    def _get_hourly_array(self):
-        array = np.zeros(8760, dtype=np.int)
-        for interval in self._data.values():
-            array += interval.to_hourly_array()
-        return array
+    @property
+    def digest(self):
+        """A hash of the interval names and definitions
+        """
+        if self._digest is None:
+            digest = sha1(str(self._base_year).encode('utf-8'))
+            for interval in self._data.values():
+                digest.update(repr((interval.name, interval.interval)).encode('utf-8'))
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    @property
+    def resolution(self):
+        """The coarsest time slot, in seconds, which divides every interval
+        boundary in the set
+
+        Returns
+        -------
+        int
+        """
+        return self._resolution
+
+    def slot_owner(self, resolution=None):
+        """The position of the interval which contains each time slot of the
+        year
+
+        Arguments
+        ---------
+        resolution: int, default=None
+            The length of a time slot in seconds, which must divide the
+            resolution of the set; defaults to the resolution of the set
+
+        Returns
+        -------
+        numpy.ndarray
+            An int32 array with one entry per time slot, holding -1 for slots
+            which are not in any interval
+        """
+        factor = self._slot_factor(resolution)
+        return np.repeat(self._slot_owner, factor)
+
+    def slot_weights(self, resolution=None):
+        """The share of its interval's value apportioned to each time slot of
+        the year
+
+        A value is divided equally between each of the ranges making up its
+        interval, and then evenly across the time slots within each range.
+
+        Arguments
+        ---------
+        resolution: int, default=None
+            The length of a time slot in seconds, which must divide the
+            resolution of the set; defaults to the resolution of the set
+
+        Returns
+        -------
+        numpy.ndarray
+            A float array with one entry per time slot
+        """
+        factor = self._slot_factor(resolution)
+        return np.repeat(self._slot_weights, factor) / factor
+
+    @property
+    def durations(self):
+        """The number of seconds in each interval
+
+        Returns
+        -------
+        numpy.ndarray
+            An integer array with one entry per interval
+        """
+        return self._slot_counts * self._resolution
+
+    @property
+    def hour_counts(self):
+        """The number of hours in each interval
+
+        Returns
+        -------
+        numpy.ndarray
+            A float array with one entry per interval
+        """
+        return self.durations / 3600
+
+    def _slot_factor(self, resolution):
+        if resolution is None:
+            return 1
+        if self._resolution % resolution != 0:
+            msg = "Resolution of {}s does not divide the {}s resolution of interval set {}"
+            raise ValueError(msg.format(resolution, self._resolution, self.name))
+        return self._resolution // resolution
+
+    def _build_slot_arrays(self):
+        """Compute the resolution of the set, then the slot coverage, slot
+        ownership and apportioning weights of the intervals in a single pass
+        over their ranges
+        """
+        ranges = [np.clip(interval.seconds, 0, SECONDS_IN_YEAR)
+                  for interval in self._data.values()]
+        resolution = np.gcd.reduce(
+            np.concatenate([bounds.ravel() for bounds in ranges] + [[SECONDS_IN_YEAR]]))
+        self._resolution = int(resolution)
+
+        n_slots = SECONDS_IN_YEAR // self._resolution
+        boundaries = np.zeros(n_slots + 1, dtype=np.int32)
+        owner = np.full(n_slots, -1, dtype=np.int32)
+        weights = np.zeros(n_slots)
+        counts = np.zeros(len(self._data), dtype=np.int64)
+
+        for idx, bounds in enumerate(ranges):
+            slots = bounds // self._resolution
+            divisor = len(slots)
+            for lower, upper in slots:
+                boundaries[lower] += 1
+                boundaries[upper] -= 1
+                if upper > lower:
+                    owner[lower:upper] = idx
+                    weights[lower:upper] = 1 / ((upper - lower) * divisor)
+                    counts[idx] += upper - lower
+
+        self._slot_count = np.cumsum(boundaries[:-1])
+        self._slot_owner = owner
+        self._slot_weights = weights
+        self._slot_counts = counts
+
+    def _get_slot_array(self):
+        return self._slot_count
 
     def _validate_intervals(self):
-        array = self._get_hourly_array()
-        duplicate_hours = np.where(array > 1)[0]
-        if len(duplicate_hours) > 0:
-            hour = duplicate_hours[0]
+        array = self._get_slot_array()
+        duplicate_slots = np.where(array > 1)[0]
+        if len(duplicate_slots) > 0:
+            hour = duplicate_slots[0] * self._resolution // 3600
             msg = "Duplicate entry for hour {} in interval set {}."
             raise ValueError(msg.format(hour, self.name))
 
@@ -422,13 +626,53 @@ class IntervalSet(ResolutionSet):
 
 class TimeIntervalRegister(Register):
     """Holds the set of time-intervals used by the SectorModels
+
+    Conversions apportion data into time slots of equal length, then sum the
+    slots into the target intervals. The slot length is the
+    :py:attr:`resolution` of the register, which defaults to the coarsest
+    common divisor of the registered interval sets.
     """
 
     def __init__(self):
         self._register = OrderedDict()
         self._conversions = defaultdict(dict)
+        self._resolution = None
         self.logger = logging.getLogger(__name__)
 
+    @property
+    def resolution(self):
+        """The length of a time slot, in seconds, used to convert between
+        interval sets
+
+        Setting the resolution overrides the default, which is the coarsest
+        slot that divides the resolution of every registered interval set.
+        Setting it to None restores the default.
+
+        Returns
+        -------
+        int
+        """
+        if self._resolution is not None:
+            return self._resolution
+        resolutions = [interval_set.resolution
+                       for interval_set in self._register.values()]
+        return int(np.gcd.reduce(resolutions + [SECONDS_IN_YEAR]))
+
+    @resolution.setter
+    def resolution(self, value):
+        if value is not None:
+            for interval_set in self._register.values():
+                self._check_resolution(interval_set, value)
+        self._resolution = value
+
+    @staticmethod
+    def _check_resolution(interval_set, resolution):
+        if interval_set.resolution % resolution != 0:
+            msg = "Resolution of {}s is too coarse for interval set {}, which " \
+                  "requires {}s"
+            raise ValueError(msg.format(resolution, interval_set.name,
+                                        interval_set.resolution))
+
     @property
     def names(self):
         """A list of the interval set names contained in the register
@@ -471,6 +715,8 @@ class TimeIntervalRegister(Register):
         if interval_set.name in self._register:
             msg = "An interval set named {} has already been loaded"
             raise ValueError(msg.format(interval_set.name))
+        if self._resolution is not None:
+            self._check_resolution(interval_set, self._resolution)
 
         self._register[interval_set.name] = interval_set
         self.logger.info("Adding interval set '%s' to register", interval_set.name)
@@ -494,48 +740,125 @@ class TimeIntervalRegister(Register):
             An array of the resampled timeseries values.
 
         """
+        coefficients = self.get_coefficients(from_interval_set_name,
+                                             to_interval_set_name)
+        return coefficients.dot(data)
+
+    def get_coefficients(self, from_interval_set_name, to_interval_set_name,
+                         aggregation='sum'):
+        """Return the matrix which converts data between two interval sets
+
+        The matrix is computed the first time a pair of interval sets is
+        requested for each kind of aggregation and cached for subsequent
+        conversions.
+
+        Parameters
+        ----------
+        from_interval_set_name: str
+            The unique identifier of the source interval set
+        to_interval_set_name: str
+            The unique identifier of the target interval set
+        aggregation: str, default='sum'
+            One of ``sum``, ``mean``, ``max`` or ``min``
+
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            A sparse matrix with dimensions to_intervals x from_intervals
+        """
         from_interval_set = self.get_entry(from_interval_set_name)
         to_interval_set = self.get_entry(to_interval_set_name)
 
-        converted = np.zeros(len(to_interval_set))
-        hourly_values = self._convert_to_hourly_buckets(data, from_interval_set)
+        conversions = self._conversions[from_interval_set.name]
+        if aggregation == 'sum':
+            key = to_interval_set.name
+        else:
+            key = (to_interval_set.name, aggregation)
+
+        if key not in conversions:
+            self.logger.debug("Computing %s conversion coefficients from %s to %s",
+                              aggregation, from_interval_set.name, to_interval_set.name)
+            if aggregation == 'sum':
+                conversions[key] = self._load_or_compute_coefficients(
+                    from_interval_set, to_interval_set, self._conversion_coefficients)
+            else:
+                overlap = self._overlap(from_interval_set, to_interval_set)
+                conversions[key] = self._aggregation_coefficients(overlap, aggregation)
+        return conversions[key]
+
+    def _conversion_coefficients(self, from_interval_set, to_interval_set):
+        """Compose the matrices which apportion data from the source
+        intervals into time slots, then sum the time slots into the target
+        intervals
+
+        The result does not depend on the resolution used, so long as it
+        divides the resolution of both sets, so cached coefficients remain
+        valid when further interval sets are registered.
 
-        for idx, interval in enumerate(to_interval_set.data.values()):
-            interval_tuples = interval.to_hours()
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            A sparse matrix with dimensions to_intervals x from_intervals
+        """
+        resolution = self.resolution
+        to_slots = self._apportion_matrix(from_interval_set, resolution)
+        from_slots = self._aggregate_matrix(to_interval_set, resolution)
+        return csr_matrix(from_slots.dot(to_slots))
 
-            for lower, upper in interval_tuples:
-                self.logger.debug("Range: %s-%s", lower, upper)
-                converted[idx] += sum(hourly_values[lower:upper])
+    def _overlap(self, from_interval_set, to_interval_set):
+        """Return the number of seconds shared by each pair of intervals
 
-        return converted
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            A sparse matrix with dimensions to_intervals x from_intervals
+        """
+        resolution = self.resolution
+        from_slots = self._aggregate_matrix(from_interval_set, resolution)
+        to_slots = self._aggregate_matrix(to_interval_set, resolution)
+        return csr_matrix(to_slots.dot(from_slots.T) * resolution)
 
-    def _convert_to_hourly_buckets(self, timeseries, interval_set):
-        """Iterates through the `timeseries` and assigns values to hourly buckets
+    @staticmethod
+    def _apportion_matrix(interval_set, resolution):
+        """Build the matrix which assigns values to time slots
 
         Parameters
         ----------
-        timeseries: :class:`numpy.ndarray`
-            The timeseries to convert to hourly buckets ready for further
-            operations
-        interval_set: list of :class:`smif.convert.Interval`
-            The interval set associated with the timeseries
+        interval_set: :class:`smif.convert.interval.IntervalSet`
+        resolution: int
+            The length of a time slot in seconds
 
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            A sparse matrix with dimensions slots x intervals
         """
-        hourly_values = np.zeros(8760)
+        owner = interval_set.slot_owner(resolution)
+        slots = np.flatnonzero(owner >= 0)
+        values = interval_set.slot_weights(resolution)[slots]
+        return csr_matrix((values, (slots, owner[slots])),
+                          shape=(len(owner), len(interval_set)))
 
-        for value, interval in zip(timeseries, interval_set.data.values()):
-            list_of_intervals = interval.to_hours()
-            divisor = len(list_of_intervals)
-            for lower, upper in list_of_intervals:
-                self.logger.debug("lower: %s, upper: %s", lower, upper)
-                number_hours_in_range = upper - lower
-                self.logger.debug("number_hours: %s", number_hours_in_range)
+    @staticmethod
+    def _aggregate_matrix(interval_set, resolution):
+        """Build the matrix which sums time slots into intervals
 
-                apportioned_value = value / number_hours_in_range
-                self.logger.debug("apportioned_value: %s", apportioned_value)
-                hourly_values[lower:upper] = apportioned_value / divisor
+        Parameters
+        ----------
+        interval_set: :class:`smif.convert.interval.IntervalSet`
+        resolution: int
+            The length of a time slot in seconds
 
-        return hourly_values
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            A sparse matrix with dimensions intervals x slots
+        """
+        owner = interval_set.slot_owner(resolution)
+        slots = np.flatnonzero(owner >= 0)
+        values = np.ones(len(slots))
+        return csr_matrix((values, (owner[slots], slots)),
+                          shape=(len(interval_set), len(owner)))
 
 
 __REGISTER = TimeIntervalRegister()
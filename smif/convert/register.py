@@ -1,10 +1,34 @@
 """Register and ResolutionSet abstract classes to contain area and interval
 metadata.
 """
+import logging
+import os
 from abc import ABCMeta, abstractmethod
+from hashlib import sha1
+from tempfile import NamedTemporaryFile
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags, load_npz, save_npz
+
+"""The ways in which values may combine when converted between resolutions
+
+``sum`` apportions and accumulates extensive quantities, ``mean`` takes the
+overlap-weighted average of intensive quantities such as prices, while
+``max`` and ``min`` take the extreme of the overlapping values.
+"""
+AGGREGATIONS = ('sum', 'mean', 'max', 'min')
 
 
 class Register(metaclass=ABCMeta):
+    """Holds a set of ResolutionSets and the coefficients for converting data
+    between them
+
+    If :attr:`cache_dir` is set, conversion coefficients are stored on disk
+    as ``.npz`` files, keyed by a hash of the definitions of each pair of
+    sets, and read back instead of being recomputed.
+    """
+
+    cache_dir = None
 
     @abstractmethod
     def register(self, resolution_set):
@@ -21,6 +45,100 @@ class Register(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
+    def _aggregation_coefficients(self, overlap, aggregation):
+        """Derive the coefficients for an aggregation kind from the overlap
+        between two sets
+
+        Arguments
+        ---------
+        overlap : scipy.sparse.spmatrix
+            Matrix with dimensions to_entries x from_entries holding the
+            size of the overlap between each pair of entries
+        aggregation : str
+            One of ``mean``, ``max`` or ``min``
+
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+            For ``mean``, the row-normalised overlap weights. For ``max`` and
+            ``min``, a matrix of ones marking the overlapping entries, which
+            is applied by reduction rather than multiplication
+        """
+        overlap = csr_matrix(overlap)
+        overlap.eliminate_zeros()
+        if aggregation == 'mean':
+            totals = np.asarray(overlap.sum(axis=1)).ravel()
+            scale = np.divide(1, totals, out=np.zeros(len(totals)), where=totals > 0)
+            return csr_matrix(diags(scale).dot(overlap))
+        elif aggregation in ('max', 'min'):
+            pattern = overlap.copy()
+            pattern.data[:] = 1
+            return pattern
+        else:
+            msg = "Aggregation '{}' is not one of {}"
+            raise ValueError(msg.format(aggregation, ", ".join(AGGREGATIONS)))
+
+    def _load_or_compute_coefficients(self, from_set, to_set, compute):
+        """Return conversion coefficients from the on-disk cache, or compute
+        and cache them
+
+        Arguments
+        ---------
+        from_set : smif.convert.register.ResolutionSet
+        to_set : smif.convert.register.ResolutionSet
+        compute : func
+            Called as ``compute(from_set, to_set)`` to generate a
+            :class:`scipy.sparse.spmatrix` on a cache miss
+
+        Returns
+        -------
+        :class:`scipy.sparse.csr_matrix`
+        """
+        if self.cache_dir is None:
+            return compute(from_set, to_set)
+
+        logger = logging.getLogger(__name__)
+        path = self._coefficient_cache_path(from_set, to_set)
+        if os.path.exists(path):
+            try:
+                coefficients = load_npz(path).tocsr()
+            except (OSError, ValueError) as ex:
+                logger.warning("Ignoring unreadable coefficient cache %s: %s", path, ex)
+            else:
+                logger.debug("Read conversion coefficients from %s to %s from %s",
+                             from_set.name, to_set.name, path)
+                return coefficients
+
+        coefficients = compute(from_set, to_set)
+        try:
+            self._write_coefficient_cache(path, coefficients)
+        except OSError as ex:
+            logger.warning("Could not cache conversion coefficients in %s: %s", path, ex)
+        else:
+            logger.debug("Wrote conversion coefficients from %s to %s to %s",
+                         from_set.name, to_set.name, path)
+        return coefficients
+
+    def _write_coefficient_cache(self, path, coefficients):
+        """Write coefficients to a temporary file and move it into place, so
+        that concurrent model runs sharing a cache never read a partially
+        written file, and no temporary file is left behind on failure
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = NamedTemporaryFile(dir=self.cache_dir, suffix='.npz', delete=False)
+        try:
+            with tmp:
+                save_npz(tmp, coefficients)
+            os.replace(tmp.name, path)
+        except BaseException:
+            os.remove(tmp.name)
+            raise
+
+    def _coefficient_cache_path(self, from_set, to_set):
+        key = "{}:{}:{}".format(type(self).__name__, from_set.digest, to_set.digest)
+        filename = "{}.npz".format(sha1(key.encode('utf-8')).hexdigest())
+        return os.path.join(self.cache_dir, filename)
+
 
 class ResolutionSet(metaclass=ABCMeta):
     @property
@@ -43,6 +161,18 @@ class ResolutionSet(metaclass=ABCMeta):
     def data(self, value):
         raise NotImplementedError
 
+    @property
+    @abstractmethod
+    def digest(self):
+        """Implement to return a hash of the ResolutionSet definition
+
+        Returns
+        -------
+        str
+            A hex digest which changes whenever the entries change
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def get_entry_names(self):
         """Get the names of the entries in the ResolutionSet
@@ -1,13 +1,32 @@
 """Handles conversion between units used in the `SosModel`
 
-First implementation delegates to pint.
+First implementation delegates to pint. The pint registry is slow to build,
+so it is only created on first use, and parsed unit strings are memoised.
 """
 import logging
 
-from pint import UndefinedUnitError, UnitRegistry
-
 LOGGER = logging.getLogger()
-UNIT_REGISTRY = UnitRegistry()
+
+_UNIT_REGISTRY = None
+
+"""Memo of unit strings already parsed, mapping to the :class:`pint.Unit` or
+None if the string was not recognised
+"""
+_PARSED_UNITS = {}
+
+
+def get_unit_registry():
+    """Return the pint UnitRegistry, building it on first use
+
+    Returns
+    -------
+    :class:`pint.UnitRegistry`
+    """
+    global _UNIT_REGISTRY
+    if _UNIT_REGISTRY is None:
+        from pint import UnitRegistry
+        _UNIT_REGISTRY = UnitRegistry()
+    return _UNIT_REGISTRY
 
 
 def parse_unit(unit_string):
@@ -21,9 +40,47 @@ def parse_unit(unit_string):
     -------
     quantity : :class:`pint.Unit`
     """
-    try:
-        unit = UNIT_REGISTRY.parse_units(unit_string)
-    except UndefinedUnitError:
+    if unit_string not in _PARSED_UNITS:
+        from pint import UndefinedUnitError
+        try:
+            _PARSED_UNITS[unit_string] = get_unit_registry().parse_units(unit_string)
+        except UndefinedUnitError:
+            _PARSED_UNITS[unit_string] = None
+
+    unit = _PARSED_UNITS[unit_string]
+    if unit is None:
         LOGGER.warning("Unrecognised unit: %s", unit_string)
-        unit = None
     return unit
+
+
+def conversion_factors(from_unit_string, to_unit_string):
+    """Derive the linear conversion from one unit to another
+
+    Pint is consulted once, so that data may then be converted with plain
+    arithmetic as ``converted = data * multiplier + offset``.
+
+    Parameters
+    ----------
+    from_unit_string : str
+    to_unit_string : str
+
+    Returns
+    -------
+    tuple
+        The (multiplier, offset) as floats
+
+    Raises
+    ------
+    ValueError
+        If either unit is not recognised, or the units are incompatible
+    """
+    from pint import DimensionalityError, UndefinedUnitError
+    registry = get_unit_registry()
+    try:
+        zero = registry.Quantity(0, from_unit_string).to(to_unit_string)
+        one = registry.Quantity(1, from_unit_string).to(to_unit_string)
+    except (UndefinedUnitError, DimensionalityError) as ex:
+        msg = "Cannot convert from {} to {}: {}"
+        raise ValueError(msg.format(from_unit_string, to_unit_string, ex))
+    offset = float(zero.magnitude)
+    return float(one.magnitude) - offset, offset
@@ -5,8 +5,6 @@
 import logging
 import os
 
-import fiona
-
 from .load import load
 from .validate import (validate_scenario_data, validate_sos_model_config,
                        validate_time_intervals, validate_timesteps)
@@ -43,6 +41,20 @@ class SosModelReader(object):
         self.convergence_max_iterations = None
         self.convergence_absolute_tolerance = None
         self.convergence_relative_tolerance = None
+        self.convergence_accelerator = None
+        self.convergence_relaxation_factor = None
+        self.convergence_anderson_depth = None
+        self.convergence_ordering = None
+        self.convergence_full_history = None
+        self.convergence_warm_start = None
+
+        # Conversion coefficient cache and parallelism
+        self.conversion_cache_dir = None
+        self.conversion_processes = None
+
+        # Concurrent execution of independent models
+        self.parallel_executor = None
+        self.parallel_workers = None
 
     def load(self):
         """Load and check all config
@@ -59,6 +71,18 @@ class SosModelReader(object):
         self.convergence_max_iterations = self.load_convergence_max_iterations()
         self.convergence_absolute_tolerance = self.load_convergence_absolute_tolerance()
         self.convergence_relative_tolerance = self.load_convergence_relative_tolerance()
+        self.convergence_accelerator = self.load_convergence_accelerator()
+        self.convergence_relaxation_factor = self.load_convergence_relaxation_factor()
+        self.convergence_anderson_depth = self.load_convergence_anderson_depth()
+        self.convergence_ordering = self.load_convergence_ordering()
+        self.convergence_full_history = self.load_convergence_full_history()
+        self.convergence_warm_start = self.load_convergence_warm_start()
+
+        self.conversion_cache_dir = self.load_conversion_cache_dir()
+        self.conversion_processes = self.load_conversion_processes()
+
+        self.parallel_executor = self.load_parallel_executor()
+        self.parallel_workers = self.load_parallel_workers()
 
     @property
     def data(self):
@@ -88,6 +112,33 @@ class SosModelReader(object):
                 and the data as the value
             scenario_metadata: list of dicts
                 The spatial and temporal resolutions and units of scenario data
+            convergence_accelerator: str
+                ``none``, ``relaxation``, ``aitken`` or ``anderson`` to
+                accelerate solving interdependencies, or None
+            convergence_relaxation_factor: float
+                Relaxation factor of the accelerator, or None
+            convergence_anderson_depth: int
+                Number of previous iterations used by Anderson mixing, or None
+            convergence_ordering: str
+                ``jacobi`` or ``gauss_seidel`` ordering of models within each
+                iteration when solving interdependencies, or None
+            convergence_full_history: bool
+                Whether to keep the results of every iteration when solving
+                interdependencies, or None
+            convergence_warm_start: str
+                ``previous``, ``extrapolate`` or ``zeros`` initial estimate
+                when solving interdependencies, or None
+            conversion_cache_dir: str
+                Absolute path of the folder in which to cache conversion
+                coefficients, or None
+            conversion_processes: int
+                Number of processes used to compute region conversion
+                coefficients, or None
+            parallel_executor: str
+                ``thread``, ``process`` or ``worker`` to run independent
+                models concurrently, or None
+            parallel_workers: int
+                Number of workers used to run independent models, or None
         """
         return {
             "timesteps": self.timesteps,
@@ -100,7 +151,17 @@ class SosModelReader(object):
             "convergence_max_iterations": self.convergence_max_iterations,
             "convergence_absolute_tolerance": self.convergence_absolute_tolerance,
             "convergence_relative_tolerance": self.convergence_relative_tolerance,
+            "convergence_accelerator": self.convergence_accelerator,
+            "convergence_relaxation_factor": self.convergence_relaxation_factor,
+            "convergence_anderson_depth": self.convergence_anderson_depth,
+            "convergence_ordering": self.convergence_ordering,
+            "convergence_full_history": self.convergence_full_history,
+            "convergence_warm_start": self.convergence_warm_start,
             "dependencies": self.dependencies,
+            "conversion_cache_dir": self.conversion_cache_dir,
+            "conversion_processes": self.conversion_processes,
+            "parallel_executor": self.parallel_executor,
+            "parallel_workers": self.parallel_workers,
         }
 
     def load_sos_config(self):
@@ -160,6 +221,78 @@ class SosModelReader(object):
             if tolerance > 0:
                 return tolerance
 
+    def load_convergence_accelerator(self):
+        """Parse convergence_accelerator setting, which is checked when the
+        system-of-systems model is built
+        """
+        if "convergence_accelerator" in self._config:
+            return str(self._config["convergence_accelerator"])
+
+    def load_convergence_relaxation_factor(self):
+        """Parse convergence_relaxation_factor setting
+        """
+        if "convergence_relaxation_factor" in self._config:
+            factor = float(self._config["convergence_relaxation_factor"])
+            if factor > 0:
+                return factor
+
+    def load_convergence_anderson_depth(self):
+        """Parse convergence_anderson_depth setting
+        """
+        if "convergence_anderson_depth" in self._config:
+            depth = int(self._config["convergence_anderson_depth"])
+            if depth > 0:
+                return depth
+
+    def load_convergence_ordering(self):
+        """Parse convergence_ordering setting, which is checked when the
+        system-of-systems model is built
+        """
+        if "convergence_ordering" in self._config:
+            return str(self._config["convergence_ordering"])
+
+    def load_convergence_full_history(self):
+        """Parse convergence_full_history setting
+        """
+        if "convergence_full_history" in self._config:
+            return bool(self._config["convergence_full_history"])
+
+    def load_convergence_warm_start(self):
+        """Parse convergence_warm_start setting, which is checked when the
+        system-of-systems model is built
+        """
+        if "convergence_warm_start" in self._config:
+            return str(self._config["convergence_warm_start"])
+
+    def load_conversion_cache_dir(self):
+        """Parse conversion_cache_dir setting
+        """
+        if "conversion_cache_dir" in self._config:
+            return self._get_path_from_config(self._config["conversion_cache_dir"])
+
+    def load_conversion_processes(self):
+        """Parse conversion_processes setting
+        """
+        if "conversion_processes" in self._config:
+            processes = int(self._config["conversion_processes"])
+            if processes > 0:
+                return processes
+
+    def load_parallel_executor(self):
+        """Parse parallel_executor setting, which is checked when the
+        system-of-systems model is built
+        """
+        if "parallel_executor" in self._config:
+            return str(self._config["parallel_executor"])
+
+    def load_parallel_workers(self):
+        """Parse parallel_workers setting
+        """
+        if "parallel_workers" in self._config:
+            workers = int(self._config["parallel_workers"])
+            if workers > 0:
+                return workers
+
     def load_sector_model_data(self):
         """Parse list of sector models to run
 
@@ -182,7 +315,8 @@ class SosModelReader(object):
                 'file': 'relative file path',
                 'spatial_resolution': 'national',
                 'temporal_resolution': 'annual',
-                'units': 'kg'
+                'units': 'kg',
+                'aggregation': 'sum'  # optional
             }
 
         - data in file is list of dicts, each like::
@@ -214,7 +348,8 @@ class SosModelReader(object):
                     'name': name,
                     'spatial_resolution': spatial_res,
                     'temporal_resolution': temporal_res,
-                    'units': units
+                    'units': units,
+                    'aggregation': data_type.get('aggregation', 'sum')
                 })
 
                 file_path = self._get_path_from_config(data_type['file'])
@@ -339,6 +474,8 @@ class SosModelReader(object):
             A list of Fiona feature collections
 
         """
+        import fiona
+
         with fiona.drivers():
             with fiona.open(path) as src:
                 data = [f for f in src]
@@ -20,6 +20,9 @@ from __future__ import absolute_import, division, print_function
 
 import logging
 
+from smif.convert.area import get_register as get_region_register
+from smif.convert.interval import get_register as get_interval_register
+from smif.convert.register import AGGREGATIONS
 from smif.convert.unit import parse_unit
 
 __author__ = "Will Usher, Tom Russell"
@@ -27,6 +30,20 @@ __copyright__ = "Will Usher, Tom Russell, University of Oxford 2017"
 __license__ = "mit"
 
 
+def _get_registers():
+    """Pair the resolution attributes of Metadata with their registers
+    """
+    return (('spatial_resolution', get_region_register()),
+            ('temporal_resolution', get_interval_register()))
+
+
+class _RegisteredResolution(object):
+    """Stands in for a registered resolution set in a pickled Metadata
+    """
+    def __init__(self, name):
+        self.name = name
+
+
 class Metadata(object):
     """All metadata about a single dataset, typically model input or output
 
@@ -40,20 +57,48 @@ class Metadata(object):
        The interval set that defines the temporal resolution
     units: str
         Name of the units for the dataset values
+    aggregation: str, default='sum'
+        How values combine when converted between resolutions: ``sum`` for
+        extensive quantities such as energy demand, ``mean`` for intensive
+        quantities such as prices, or ``max`` or ``min``
 
     """
-    def __init__(self, name, spatial_resolution, temporal_resolution, units):
+    def __init__(self, name, spatial_resolution, temporal_resolution, units,
+                 aggregation='sum'):
         self.logger = logging.getLogger(__name__)
         self.name = name
         self.spatial_resolution = spatial_resolution
         self.temporal_resolution = temporal_resolution
         self.units = self.normalise_unit(units, name)
 
+        if aggregation not in AGGREGATIONS:
+            msg = "Aggregation '{}' of {} is not one of {}"
+            raise ValueError(msg.format(aggregation, name, ", ".join(AGGREGATIONS)))
+        self.aggregation = aggregation
+
+    def __getstate__(self):
+        # registered region and interval sets are sent by name, and looked up
+        # again in the registers, which a forked process shares
+        state = self.__dict__.copy()
+        for key, register in _get_registers():
+            resolution = state[key]
+            name = getattr(resolution, 'name', None)
+            if name in register.names and register.get_entry(name) is resolution:
+                state[key] = _RegisteredResolution(name)
+        return state
+
+    def __setstate__(self, state):
+        for key, register in _get_registers():
+            if isinstance(state[key], _RegisteredResolution):
+                state[key] = register.get_entry(state[key].name)
+        self.__dict__.update(state)
+
     def __eq__(self, other):
         return self.name == other.name \
             and self.spatial_resolution == other.spatial_resolution \
             and self.temporal_resolution == other.temporal_resolution \
-            and self.units == other.units
+            and self.units == other.units \
+            and self.aggregation == other.aggregation
 
     def normalise_unit(self, unit_string, param_name):
         """Parse unit and return standard string representation
@@ -90,7 +135,8 @@ class MetadataSet(object):
                     'name': 'heat_demand'
                     'spatial_resolution': smif.convert.ResolutionSet
                     'temporal_resolution': smif.convert.ResolutionSet
-                    'units': 'kW'
+                    'units': 'kW',
+                    'aggregation': 'sum'  # optional
                 }
 
         Or, a list of smif.metadata.Metadata
@@ -141,12 +187,13 @@ class MetadataSet(object):
         ---------
         metadata_item: dict
             A dictionary with keys 'name', 'spatial resolution', 'temporal
-            resolution' and 'units'
+            resolution', 'units' and optionally 'aggregation'
         """
         metadata = Metadata(metadata_item['name'],
                             metadata_item['spatial_resolution'],
                             metadata_item['temporal_resolution'],
-                            metadata_item['units'])
+                            metadata_item['units'],
+                            metadata_item.get('aggregation', 'sum'))
         self._metadata[metadata.name] = metadata
 
     def add_metadata_object(self, metadata_object):
@@ -44,6 +44,7 @@ A more comprehensive example with one scenario and one scenario model:
 """
 from abc import ABCMeta, abstractmethod
 from logging import getLogger
+from weakref import WeakSet
 
 from smif.convert.area import get_register as get_region_register
 from smif.convert.interval import get_register as get_interval_register
@@ -69,14 +70,43 @@ class Model(metaclass=ABCMeta):
         self._model_inputs = MetadataSet([])
         self._model_outputs = MetadataSet([])
         self.deps = {}
+        # free inputs derived on first use
+        self._free_inputs = None
 
         self._parameters = ParameterList()
 
         self.regions = get_region_register()
         self.intervals = get_interval_register()
 
+        # composite models containing this model, notified of changes
+        self._parents = WeakSet()
+
         self.logger = getLogger(__name__)
 
+    def __getstate__(self):
+        # the registers are module-level singletons, so are rebound rather than
+        # copied with every model sent to another process
+        state = self.__dict__.copy()
+        for key in ('_parents', 'regions', 'intervals'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.regions = get_region_register()
+        self.intervals = get_interval_register()
+        self._parents = WeakSet()
+
+    def _invalidate(self):
+        """Discard anything derived from the structure of this model, and of
+        the composite models which contain it
+
+        Called whenever inputs, dependencies or contained models are added.
+        """
+        self._free_inputs = None
+        for parent in list(self._parents):
+            parent._invalidate()
+
     @property
     def model_inputs(self):
         """All model inputs defined at this layer
@@ -105,6 +135,20 @@ class Model(metaclass=ABCMeta):
         Free inputs are passed up to higher layers for deferred linkages to
         dependencies.
 
+        The set is derived on first access and reused until an input,
+        dependency or contained model is added, so should not be modified.
+
+        Returns
+        -------
+        smif.metadata.MetadataSet
+        """
+        if self._free_inputs is None:
+            self._free_inputs = self._get_free_inputs()
+        return self._free_inputs
+
+    def _get_free_inputs(self):
+        """Derive the free inputs at this layer
+
         Returns
         -------
         smif.metadata.MetadataSet
@@ -161,6 +205,7 @@ class Model(metaclass=ABCMeta):
                                           function))
             msg = "Added dependency from '%s' to '%s'"
             self.logger.debug(msg, source_model.name, self.name)
+            self._invalidate()
         else:
             if sink in self.model_inputs.names:
                 raise NotImplementedError("Multiple source dependencies"
@@ -184,6 +229,7 @@ class Model(metaclass=ABCMeta):
         parameter_dict['parent'] = self
 
         self._parameters.add_parameters_from_list([parameter_dict])
+        self._invalidate()
 
     @property
     def parameters(self):
@@ -269,16 +315,12 @@ class CompositeModel(Model, metaclass=ABCMeta):
 
         return sim_data
 
-    @property
-    def free_inputs(self):
-        """Returns the free inputs not linked to a dependency at this layer
+    def _get_free_inputs(self):
+        """Derive the free inputs not linked to a dependency at this layer
 
         For this composite :class:`~smif.model.CompositeModel` this includes
         the free_inputs from all contained smif.model.Model objects
 
-        Free inputs are passed up to higher layers for deferred linkages to
-        dependencies.
-
         Returns
         -------
         smif.metadata.MetadataSet
@@ -289,7 +331,7 @@ class CompositeModel(Model, metaclass=ABCMeta):
             free_inputs.extend(model.free_inputs)
 
         # free inputs of current layer
-        my_free_inputs = super().free_inputs
+        my_free_inputs = super()._get_free_inputs()
         free_inputs.extend(my_free_inputs)
 
         # compose a new MetadataSet containing the free inputs
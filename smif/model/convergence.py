@@ -0,0 +1,186 @@
+"""Accelerate the fixed-point iteration of interdependent models
+
+A :class:`~smif.model.model_set.ModelSet` solves ``x = g(x)``, where ``x`` is
+the vector of all outputs of the models in the set, stacked together, and
+``g`` is one run of every model. Plain fixed-point iteration takes the next
+estimate to be ``g(x)``. An accelerator instead combines the current estimate
+and the model outputs, and possibly those of earlier iterations, into a
+better next estimate, which can greatly reduce the number of iterations, each
+of which runs every model in the set.
+
+Accelerators are selected by name with :func:`get_accelerator`:
+
+``relaxation``
+    Under-relaxation, ``x + factor * (g(x) - x)``, which damps oscillation
+``aitken``
+    Relaxation with the factor updated on each iteration by Aitken's
+    delta-squared method
+``anderson``
+    Anderson mixing, which extrapolates from the estimates and outputs of up
+    to ``depth`` previous iterations
+"""
+from collections import deque
+
+import numpy as np
+
+__author__ = "Will Usher, Tom Russell"
+__copyright__ = "Will Usher, Tom Russell"
+__license__ = "mit"
+
+ACCELERATORS = ('none', 'relaxation', 'aitken', 'anderson')
+
+
+class Accelerator(object):
+    """Plain fixed-point iteration, which takes the model outputs as the next
+    estimate
+
+    Accelerators keep state between iterations, so each ModelSet needs its own
+    instance, which is reset at the start of each timestep.
+    """
+    def reset(self):
+        """Forget any earlier iterations
+        """
+        pass
+
+    def update(self, estimate, output):
+        """Return the next estimate
+
+        Arguments
+        ---------
+        estimate : numpy.ndarray
+            The stacked estimate from which the models were run
+        output : numpy.ndarray
+            The stacked outputs of the models
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return output
+
+
+class Relaxation(Accelerator):
+    """Under-relaxation, with a fixed factor
+
+    Arguments
+    ---------
+    factor : float, default=0.5
+        The fraction of the residual added to the estimate, in (0, 1] for
+        under-relaxation
+    """
+    def __init__(self, factor=0.5):
+        if factor <= 0:
+            raise ValueError("Relaxation factor must be positive, not {}".format(factor))
+        self.factor = factor
+
+    def update(self, estimate, output):
+        return estimate + self.factor * (output - estimate)
+
+
+class Aitken(Accelerator):
+    """Relaxation with a dynamic factor from Aitken's delta-squared method
+
+    Arguments
+    ---------
+    factor : float, default=0.5
+        The factor used for the first iteration
+    """
+    def __init__(self, factor=0.5):
+        if factor <= 0:
+            raise ValueError("Relaxation factor must be positive, not {}".format(factor))
+        self.initial_factor = factor
+        self.factor = factor
+        self._residual = None
+
+    def reset(self):
+        self.factor = self.initial_factor
+        self._residual = None
+
+    def update(self, estimate, output):
+        residual = output - estimate
+        if self._residual is not None:
+            delta = residual - self._residual
+            denominator = delta.dot(delta)
+            if denominator > 0:
+                self.factor = -self.factor * self._residual.dot(delta) / denominator
+        self._residual = residual
+        return estimate + self.factor * residual
+
+
+class Anderson(Accelerator):
+    """Anderson mixing over a limited number of previous iterations
+
+    Arguments
+    ---------
+    depth : int, default=5
+        The number of previous iterations used
+    factor : float, default=1.0
+        The mixing factor applied to the residuals, 1 takes the extrapolated
+        model outputs
+    """
+    def __init__(self, depth=5, factor=1.0):
+        if depth < 1:
+            raise ValueError("Anderson depth must be at least 1, not {}".format(depth))
+        if factor <= 0:
+            raise ValueError("Relaxation factor must be positive, not {}".format(factor))
+        self.depth = depth
+        self.factor = factor
+        self._history = deque(maxlen=depth + 1)
+
+    def reset(self):
+        self._history.clear()
+
+    def update(self, estimate, output):
+        residual = output - estimate
+        self._history.append((estimate, residual))
+        if len(self._history) == 1:
+            return estimate + self.factor * residual
+
+        estimates = np.array([item[0] for item in self._history])
+        residuals = np.array([item[1] for item in self._history])
+        delta_estimates = np.diff(estimates, axis=0).T
+        delta_residuals = np.diff(residuals, axis=0).T
+
+        gamma = np.linalg.lstsq(delta_residuals, residual, rcond=None)[0]
+        return estimate + self.factor * residual \
+            - (delta_estimates + self.factor * delta_residuals).dot(gamma)
+
+
+def get_accelerator(name, factor=None, depth=None):
+    """Create a convergence accelerator by name
+
+    Arguments
+    ---------
+    name : str
+        One of ``none``, ``relaxation``, ``aitken`` or ``anderson``
+    factor : float, default=None
+        The relaxation factor, if not the default for the accelerator
+    depth : int, default=None
+        The number of previous iterations used by Anderson mixing, if not the
+        default
+
+    Returns
+    -------
+    Accelerator
+
+    Raises
+    ------
+    ValueError
+        If the accelerator is not known
+    """
+    options = {}
+    if factor is not None:
+        options['factor'] = factor
+    if name == 'none':
+        return Accelerator()
+    elif name == 'relaxation':
+        return Relaxation(**options)
+    elif name == 'aitken':
+        return Aitken(**options)
+    elif name == 'anderson':
+        if depth is not None:
+            options['depth'] = depth
+        return Anderson(**options)
+    else:
+        msg = "Accelerator must be one of {}, not '{}'"
+        raise ValueError(msg.format(", ".join(ACCELERATORS), name))
@@ -1,6 +1,7 @@
 from logging import getLogger
 
 from smif.convert import SpaceTimeConvertor
+from smif.convert.unit import conversion_factors
 
 
 class Dependency():
@@ -26,54 +27,100 @@ class Dependency():
             self._function = function
         else:
             self._function = self.convert
+        self._operators = {}
+
+    def __getstate__(self):
+        # refer to the source model by name only, rather than copying it and
+        # every model and scenario upstream of it, and recompile operators on
+        # first use
+        state = self.__dict__.copy()
+        state['source_model'] = SourceModelReference(self.source_model.name)
+        state['_operators'] = {}
+        return state
 
     def convert(self, data, model_input):
         """Convert dependency data to the resolution of ``model_input``
 
+        The conversion operator for each distinct sink resolution is compiled
+        on first use and reused for all later calls. Values are combined
+        across resolutions according to the ``aggregation`` of the source.
+
         Arguments
         ---------
         data : numpy.ndarray
             The data series for conversion
         model_input : smif.metadata.MetadataSet
         """
+        return self.get_operator(model_input)(data)
 
-        from_units = self.source.units
-        to_units = model_input.units
-        self.logger.debug("Unit conversion: %s -> %s", from_units, to_units)
+    def get_operator(self, model_input):
+        """Return the conversion operator from the source to ``model_input``
 
-        if from_units != to_units:
-            raise NotImplementedError("Units conversion not implemented %s - %s",
-                                      from_units, to_units)
+        Operators are keyed by the resolutions, units and aggregation of both
+        the source and ``model_input``, so a change to either is never served
+        a stale operator.
 
-        spatial_resolution = model_input.spatial_resolution.name
-        temporal_resolution = model_input.temporal_resolution.name
-        return self._convert_data(data,
-                                  spatial_resolution,
-                                  temporal_resolution)
+        Arguments
+        ---------
+        model_input : smif.metadata.Metadata
 
-    def _convert_data(self, data, to_spatial_resolution,
-                      to_temporal_resolution):
-        """Convert data from one spatial and temporal resolution to another
+        Returns
+        -------
+        operator : smif.convert.ConversionOperator
+        """
+        key = (self.source.spatial_resolution.name,
+               self.source.temporal_resolution.name,
+               self.source.units,
+               self.source.aggregation,
+               model_input.spatial_resolution.name,
+               model_input.temporal_resolution.name,
+               model_input.units,
+               model_input.aggregation)
+        if key not in self._operators:
+            self._operators[key] = self._compile_operator(model_input)
+        return self._operators[key]
+
+    def _compile_operator(self, model_input):
+        """Resolve the conversion from the source to ``model_input``
+
+        Units are resolved once here to a multiplier and offset, so that each
+        conversion applies as plain arithmetic on the array.
 
         Parameters
         ----------
-        data : numpy.ndarray
-            The data series for conversion
-        to_spatial_resolution : smif.convert.register.ResolutionSet
-        to_temporal_resolution : smif.convert.register.ResolutionSet
+        model_input : smif.metadata.Metadata
 
         Returns
         -------
-        converted_data : numpy.ndarray
-            The converted data series
+        operator : smif.convert.ConversionOperator
 
+        Raises
+        ------
+        ValueError
+            If the units or aggregations of source and input are incompatible
         """
+        from_units = self.source.units
+        to_units = model_input.units
+        self.logger.debug("Unit conversion: %s -> %s", from_units, to_units)
+
+        if from_units != to_units:
+            multiplier, offset = conversion_factors(from_units, to_units)
+        else:
+            multiplier, offset = 1, 0
+
+        if self.source.aggregation != model_input.aggregation:
+            msg = "Aggregation of {} ({}) does not match aggregation of {} ({})"
+            raise ValueError(msg.format(self.source.name, self.source.aggregation,
+                                        model_input.name, model_input.aggregation))
+
         convertor = SpaceTimeConvertor()
-        return convertor.convert(data,
-                                 self.source.spatial_resolution.name,
-                                 to_spatial_resolution,
-                                 self.source.temporal_resolution.name,
-                                 to_temporal_resolution)
+        return convertor.get_operator(self.source.spatial_resolution.name,
+                                      model_input.spatial_resolution.name,
+                                      self.source.temporal_resolution.name,
+                                      model_input.temporal_resolution.name,
+                                      scale=multiplier,
+                                      aggregation=self.source.aggregation,
+                                      offset=offset)
 
     def get_data(self, timestep, model_input):
         data = self.source_model.simulate(timestep)
@@ -86,3 +133,18 @@ class Dependency():
     def __eq__(self, other):
         return self.source_model == other.source_model \
             and self.source == other.source
+
+
+class SourceModelReference(object):
+    """Stands in for the source model of a Dependency which has been pickled
+
+    Arguments
+    ---------
+    name : str
+        The name of the source model
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "SourceModelReference({!r})".format(self.name)
@@ -0,0 +1,136 @@
+"""Compile the simulation of a system-of-systems model into an explicit plan
+
+An :class:`ExecutionPlan` is compiled once from the run order of a
+:class:`~smif.model.sos_model.SosModel` and then walked on every timestep.
+Each :class:`PlanStep` holds, for one model or set of interdependent models,
+the already-resolved source of each input, the conversion operator for each
+dependency, and the default parameter values. Running a step only looks up
+the upstream result arrays and applies the operators.
+"""
+from smif.model import CompositeModel
+from smif.model.model_set import ModelSet
+
+__author__ = "Will Usher, Tom Russell"
+__copyright__ = "Will Usher, Tom Russell"
+__license__ = "mit"
+
+
+class ExecutionPlan(object):
+    """The resolved steps for simulating the models within a composite model
+
+    Arguments
+    ---------
+    composite : smif.model.CompositeModel
+        The model which contains the models in `run_order`
+    run_order : list
+        Models and ModelSets in a runnable order
+    """
+    def __init__(self, composite, run_order):
+        self.run_order = run_order
+
+        # position in the run order of the model or set containing each model
+        position = {}
+        for idx, unit in enumerate(run_order):
+            members = unit.models if isinstance(unit, ModelSet) else [unit]
+            for model in members:
+                position[model.name] = idx
+
+        free_inputs = composite.free_inputs
+        self.steps = []
+        for idx, unit in enumerate(run_order):
+            providers = {position[dep.source_model.name] for dep in unit.deps.values()
+                         if dep.source_model.name in position}
+            self.steps.append(PlanStep(composite, unit, free_inputs, providers - {idx}))
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+
+class PlanStep(object):
+    """The resolved inputs and parameters for running one model, or set of
+    interdependent models
+
+    Arguments
+    ---------
+    composite : smif.model.CompositeModel
+        The model which contains `model`
+    model : smif.model.Model
+        The model, or ModelSet, run in this step
+    free_inputs : smif.metadata.MetadataSet
+        The free inputs of `composite`, which are read from the data passed in
+        rather than from the results of other models
+    providers : set
+        The positions in the plan of the steps which provide inputs to this
+        step
+
+    Attributes
+    ----------
+    inputs : list
+        A tuple for each input of ``(input name, source model name, source
+        output name, conversion operator, external)``
+    """
+    def __init__(self, composite, model, free_inputs, providers):
+        self.model = model
+        self.providers = providers
+        self.composite_name = composite.name
+        self.is_composite = isinstance(model, CompositeModel)
+
+        self.inputs = []
+        for input_name, dep in model.deps.items():
+            input_ = model.model_inputs[input_name]
+            self.inputs.append((input_name,
+                                dep.source_model.name,
+                                dep.source.name,
+                                dep.get_operator(input_),
+                                input_ in free_inputs))
+
+        if self.is_composite:
+            self.defaults = {}
+            self.composite_defaults = {}
+        else:
+            self.defaults = model.parameters.defaults
+            self.composite_defaults = composite._parameters.defaults
+
+    @property
+    def name(self):
+        return self.model.name
+
+    def get_data(self, results, data=None):
+        """Gather the converted inputs and parameter values for the model
+
+        Parameter values follow the same precedence as
+        :meth:`smif.model.CompositeModel._get_parameter_values`.
+
+        Arguments
+        ---------
+        results : dict
+            Results of the models already run in this timestep
+        data : dict, default=None
+            Data passed into the composite model
+
+        Returns
+        -------
+        dict
+        """
+        sim_data = {}
+        for input_name, source_model, source, operator, external in self.inputs:
+            if external:
+                value = data[source_model][source]
+            else:
+                value = results[source_model][source]
+            sim_data[input_name] = operator(value)
+
+        if self.is_composite:
+            if data:
+                sim_data.update(data)
+        else:
+            sim_data.update(self.defaults)
+            if data and self.model.name in data:
+                sim_data.update(data[self.model.name])
+            sim_data.update(self.composite_defaults)
+            if data and self.composite_name in data:
+                sim_data.update(data[self.composite_name])
+        return sim_data
@@ -9,14 +9,39 @@ connected component. This class provides the machinery necessary
 to find a solution to each of the interdependent models.
 
 The current implementation first estimates the outputs for each model in the
-set, guaranteeing that each model will then be able to run, then begins
+set, guaranteeing that each model will then be able to run, from the
+solutions the set converged to in earlier timesteps, then begins
 iterating, running every model in the set at each iteration, monitoring the
 model outputs over the iterations, and stopping at timeout, divergence or
 convergence.
+
+Iterations may be ordered in one of two ways. In ``jacobi`` ordering, every
+model in an iteration reads the outputs of the previous iteration, so the
+models within an iteration are independent of each other. In
+``gauss_seidel`` ordering, models run in a sequence which follows their
+dependencies as far as possible, and read any outputs already produced in the
+current iteration, which usually converges in fewer iterations. In
+``jacobi`` ordering, the models of each iteration may run concurrently in a
+pool of threads or processes.
+
+Between iterations, an optional accelerator from
+:mod:`smif.model.convergence` may improve on the model outputs as the
+estimate for the next iteration.
+
+Only the results of the last two iterations, which are compared to assess
+convergence, are kept unless the full history is requested for diagnostics.
+They are held in two sets of output buffers, allocated once for the set and
+used for alternate iterations, into which model results are copied in place.
 """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from smif.model import CompositeModel, element_before
+from smif.model import CompositeModel
+from smif.model.worker import start_process_pool
+
+ORDERINGS = ('jacobi', 'gauss_seidel')
+WARM_STARTS = ('zeros', 'previous', 'extrapolate')
 
 
 class ModelSet(CompositeModel):
@@ -33,9 +58,49 @@ class ModelSet(CompositeModel):
         Used to calculate when the model interations have converged
     absolute_tolerance : float, default=1e-08
         Used to calculate when the model interations have converged
+    accelerator : smif.model.convergence.Accelerator, default=None
+        Used to derive the estimate for each iteration from the outputs of
+        the previous iteration, which are used directly if None
+    ordering : str, default='jacobi'
+        ``jacobi`` to run each iteration from the outputs of the previous
+        iteration, or ``gauss_seidel`` to use outputs already produced in the
+        current iteration
+    executor : str, default=None
+        If ``thread`` or ``process``, the models of each iteration in
+        ``jacobi`` ordering run concurrently in a pool of threads or processes.
+        Models run in a process pool must be picklable, and any changes they
+        make to their own attributes are not returned.
+    max_workers : int, default=None
+        The size of the pool, which defaults to that chosen by
+        :mod:`concurrent.futures`
+    full_history : bool, default=False
+        If True, keep the results of every iteration in `iterated_results`,
+        otherwise only those of the last two iterations
+    warm_start : str, default='previous'
+        The initial estimate in each timestep: ``previous`` for the solution
+        of the latest earlier timestep, ``extrapolate`` for a linear
+        extrapolation from the solutions of the two latest earlier timesteps,
+        or ``zeros``. Zeros are used while there are no earlier solutions.
+
+    Attributes
+    ----------
+    pool : concurrent.futures.Executor
+        A pool started by the caller, used in place of the pool otherwise
+        started for each timestep when models run concurrently, and not shut
+        down by the set
+    workers : dict
+        Workers, such as :class:`smif.model.worker.SectorModelWorker`, which
+        host models in the set and simulate them in their place, keyed by
+        model name
+    iterated_results : collections.deque or list
+        The results of each iteration, as dicts keyed by model name. Unless
+        `full_history` is set, these are the two sets of output buffers,
+        which are overwritten by later iterations and timesteps
     """
     def __init__(self, models, max_iterations=25, relative_tolerance=1e-05,
-                 absolute_tolerance=1e-08):
+                 absolute_tolerance=1e-08, accelerator=None, ordering='jacobi',
+                 executor=None, max_workers=None, full_history=False,
+                 warm_start='previous'):
         name = "-".join(sorted(model.name for model in models))
         super().__init__(name)
         self.models = models
@@ -48,6 +113,57 @@ class ModelSet(CompositeModel):
         # tolerance for convergence assessment - see numpy.allclose docs
         self.relative_tolerance = relative_tolerance
         self.absolute_tolerance = absolute_tolerance
+        self.accelerator = accelerator
+        if ordering not in ORDERINGS:
+            msg = "Ordering must be one of {}, not '{}'"
+            raise ValueError(msg.format(", ".join(ORDERINGS), ordering))
+        self.ordering = ordering
+        self._sweep_order = self._get_sweep_order()
+        if executor not in (None, 'thread', 'process'):
+            msg = "Executor must be 'thread' or 'process', not '{}'"
+            raise ValueError(msg.format(executor))
+        self.executor = executor
+        self.max_workers = max_workers
+        self.full_history = full_history
+        if warm_start not in WARM_STARTS:
+            msg = "Warm start must be one of {}, not '{}'"
+            raise ValueError(msg.format(", ".join(WARM_STARTS), warm_start))
+        self.warm_start = warm_start
+        self.pool = None
+        self.workers = {}
+        # converged results of the latest timesteps, keyed by timestep
+        self._solutions = {}
+        # output buffers for alternate iterations, allocated on first use
+        self._buffers = None
+        # models which have run in the current iteration
+        self._current_models = set()
+
+    def _get_sweep_order(self):
+        """Order the models so that as few as possible run before a model
+        whose outputs they read
+
+        Greedily picks the model with the fewest providers still to run,
+        preferring the model which provides to most of those remaining.
+
+        Returns
+        -------
+        list
+        """
+        remaining = list(self.models)
+        ordered = []
+        while remaining:
+            def key(model):
+                providers = sum(1 for dep in model.deps.values()
+                                if dep.source_model in remaining
+                                and dep.source_model is not model)
+                dependents = sum(1 for other in remaining if other is not model
+                                 and any(dep.source_model is model
+                                         for dep in other.deps.values()))
+                return (providers, -dependents)
+            model = min(remaining, key=key)
+            remaining.remove(model)
+            ordered.append(model)
+        return ordered
 
     def _derive_deps_from_models(self):
         for model in self.models:
@@ -66,60 +182,236 @@ class ModelSet(CompositeModel):
         """
         # Start by running all models in set with best guess
         # - zeroes
-        # - last year's inputs
-        self.iterated_results = [{}]
+        # - earlier timesteps' solutions
+        self._start_history()
         self.timestep = timestep
         if data is None:
             data = {}
+        if self.accelerator is not None:
+            self.accelerator.reset()
 
         for model in self.models:
-            sim_data = {}
-            sim_data = self._get_parameter_values(model, sim_data, data)
-
-            results = self.guess_results(model, timestep, sim_data)
-            self.iterated_results[-1][model.name] = results
+            self._store_results(model.name, self.guess_results(model, timestep))
 
         # - keep track of intermediate results (iterations within the timestep)
         # - stop iterating according to near-equality condition
-        for i in range(self.max_iterations):
-            if self.converged():
-                break
+        pool = self._start_pool()
+        try:
+            for i in range(self.max_iterations):
+                if self.converged():
+                    break
+                else:
+                    if i > 0 and self.accelerator is not None:
+                        self._accelerate()
+                    self._run_iteration(i, data, pool)
             else:
-                self._run_iteration(i, data)
+                raise TimeoutError("Model evaluation exceeded max iterations")
+        finally:
+            if pool is not None and pool is not self.pool:
+                pool.shutdown()
+
+        results = self.get_last_iteration_results()
+        if not self.full_history:
+            # copied out of the buffers, which the next timestep overwrites
+            results = {name: _copy_results(model_results)
+                       for name, model_results in results.items()}
+        self._set_solution(timestep, results)
+        return results
+
+    def _start_history(self):
+        """Start the results of the iterations of a timestep
+        """
+        if self.full_history:
+            self.iterated_results = [{}]
         else:
-            raise TimeoutError("Model evaluation exceeded max iterations")
+            if self._buffers is None:
+                self._buffers = (self._allocate_buffers(), self._allocate_buffers())
+            self.iterated_results = deque([self._buffers[0]], maxlen=2)
 
-        return self.get_last_iteration_results()
+    def _allocate_buffers(self):
+        """Allocate an array for each output of each model in the set, to
+        hold the results of one iteration
+        """
+        buffers = {}
+        for model in self.models:
+            buffers[model.name] = {}
+            for output in model.model_outputs.metadata:
+                shape = (len(output.get_region_names()), len(output.get_interval_names()))
+                buffers[model.name][output.name] = np.zeros(shape)
+        return buffers
+
+    def _set_solution(self, timestep, results):
+        """Keep the converged results of the models in the set for the two
+        latest timesteps, to warm start later timesteps
+        """
+        self._solutions[timestep] = {model.name: results[model.name]
+                                     for model in self.models}
+        while len(self._solutions) > 2:
+            del self._solutions[min(self._solutions)]
+
+    def _start_pool(self):
+        """Return the pool used to run the models of each iteration
+        concurrently, started for this timestep unless the caller gave one,
+        or None if they run in sequence
+        """
+        if self.executor is None or self.ordering == 'gauss_seidel':
+            return None
+        elif self.pool is not None:
+            return self.pool
+        elif self.executor == 'thread':
+            return ThreadPoolExecutor(max_workers=self.max_workers)
+        else:
+            return start_process_pool(self.max_workers)
 
-    def _run_iteration(self, i, data):
+    def _run_iteration(self, i, data, pool=None):
         """Run all models within the set
 
+        In ``gauss_seidel`` ordering, models run in the sweep order and read
+        the outputs of models which have already run in this iteration.
+        Otherwise, each model reads only the outputs of the previous
+        iteration, so if a pool is given, all models are submitted to it
+        together and their results gathered once all have finished.
+
         Arguments
         ---------
         i : int
             Iteration counter
         data : dict
             The data passed into the model within the set
+        pool : concurrent.futures.Executor, default=None
+            The pool in which to run the models concurrently
         """
-        self.iterated_results.append({})
-        for model in self.models:
-            model_data = {}
-            for input_name, dep in model.deps.items():
-                input_ = model.model_inputs[input_name]
-                if input_ in self.model_inputs:
-                    # if external dependency
-                    dep_data = data[dep.source.name]
-                else:
-                    # else, pull from iterated results
-                    dep_data = \
-                        self.iterated_results[-2][dep.source_model.name][dep.source.name]
-                model_data[input_name] = dep.convert(dep_data, input_)
-            results = model.simulate(self.timestep, model_data)
+        if self.full_history:
+            self.iterated_results.append({})
+        elif self.iterated_results[-1] is self._buffers[0]:
+            self.iterated_results.append(self._buffers[1])
+        else:
+            self.iterated_results.append(self._buffers[0])
+        self._current_models = set()
+
+        if pool is not None:
+            futures = [pool.submit(self._get_simulate(model), self.timestep,
+                                   self._get_iteration_data(model, data))
+                       for model in self.models]
+            for model, future in zip(self.models, futures):
+                self._set_iteration_results(i, model, future.result())
+        else:
+            order = self._sweep_order if self.ordering == 'gauss_seidel' else self.models
+            for model in order:
+                simulate = self._get_simulate(model)
+                results = simulate(self.timestep, self._get_iteration_data(model, data))
+                self._set_iteration_results(i, model, results)
+
+    def _get_simulate(self, model):
+        """Return the function which simulates a model in the set, through
+        the worker hosting it if there is one
+        """
+        if model.name in self.workers:
+            return self.workers[model.name].simulate
+        return model.simulate
+
+    def _get_iteration_data(self, model, data):
+        """Gather the dependency data for a model in the current iteration
 
-            self.logger.debug("Iteration %s, model %s, results: %s",
-                              i, model.name, results)
-            for model_name, model_results in results.items():
-                self.iterated_results[-1][model_name] = model_results
+        Arguments
+        ---------
+        model : smif.model.Model
+        data : dict
+            The data passed into the model within the set
+
+        Returns
+        -------
+        dict
+        """
+        gauss_seidel = self.ordering == 'gauss_seidel'
+        model_data = {}
+        for input_name, dep in model.deps.items():
+            input_ = model.model_inputs[input_name]
+            if input_ in self.model_inputs:
+                # if external dependency
+                dep_data = data[dep.source.name]
+            elif gauss_seidel and dep.source_model.name in self._current_models:
+                # pull from results already produced in this iteration
+                dep_data = \
+                    self.iterated_results[-1][dep.source_model.name][dep.source.name]
+            else:
+                # else, pull from iterated results
+                dep_data = \
+                    self.iterated_results[-2][dep.source_model.name][dep.source.name]
+            model_data[input_name] = dep.convert(dep_data, input_)
+        return model_data
+
+    def _set_iteration_results(self, i, model, results):
+        """Store the results of a model in the current iteration
+        """
+        self.logger.debug("Iteration %s, model %s, results: %s",
+                          i, model.name, results)
+        for model_name, model_results in results.items():
+            self._store_results(model_name, model_results)
+            self._current_models.add(model_name)
+
+    def _store_results(self, model_name, model_results):
+        """Store the results of a model in the last iteration, copying arrays
+        into the buffers which hold them, unless the full history is kept
+        """
+        iteration = self.iterated_results[-1]
+        if self.full_history or not isinstance(model_results, dict):
+            iteration[model_name] = model_results
+            return
+        stored = iteration.setdefault(model_name, {})
+        for name, value in model_results.items():
+            self._store_output(stored, name, value)
+
+    def _store_output(self, stored, name, value):
+        """Copy an array into its buffer in place, or store a copy where it
+        does not fit the buffer, or store any other value as it is
+        """
+        buffer = stored.get(name)
+        if self.full_history or not isinstance(value, np.ndarray):
+            stored[name] = value
+        elif isinstance(buffer, np.ndarray) and buffer.shape == value.shape \
+                and np.can_cast(value.dtype, buffer.dtype):
+            np.copyto(buffer, value)
+        else:
+            stored[name] = value.copy()
+
+    def _accelerate(self):
+        """Replace the outputs of the last iteration with the accelerated
+        estimate from which to run the next iteration
+
+        Numeric outputs of all models in the set are stacked into a single
+        vector for the accelerator. The estimate and outputs being compared
+        for convergence stay the last two entries in `iterated_results`.
+        """
+        estimate = self.iterated_results[-2]
+        output = self.iterated_results[-1]
+
+        keys = []
+        for model in self.models:
+            for param in model.model_outputs.metadata:
+                value = output.get(model.name, {}).get(param.name)
+                if isinstance(value, np.ndarray):
+                    keys.append((model.name, param.name))
+        if not keys:
+            return
+
+        stacked_estimate = np.concatenate(
+            [np.ravel(estimate[model][param]) for model, param in keys]).astype(float)
+        stacked_output = np.concatenate(
+            [np.ravel(output[model][param]) for model, param in keys]).astype(float)
+        accelerated = self.accelerator.update(stacked_estimate, stacked_output)
+
+        if self.full_history:
+            # the outputs of the models are kept as they are in the history
+            output = {name: dict(results) if isinstance(results, dict) else results
+                      for name, results in output.items()}
+            self.iterated_results[-1] = output
+        start = 0
+        for model, param in keys:
+            shape = output[model][param].shape
+            end = start + output[model][param].size
+            self._store_output(output[model], param, accelerated[start:end].reshape(shape))
+            start = end
 
     def get_last_iteration_results(self):
         """Return results from the last iteration
@@ -131,26 +423,41 @@ class ModelSet(CompositeModel):
         """
         return self.iterated_results[-1]
 
-    def guess_results(self, model, timestep, data):
+    def guess_results(self, model, timestep):
         """Dependency-free guess at a model's result set.
 
-        Initially, guess zeroes, or the previous timestep's results.
+        Guess the solution converged to in the latest earlier timestep, or
+        extrapolate linearly from the two latest earlier timesteps, according
+        to `warm_start`. Initially, or if `warm_start` is ``zeros``, guess
+        zeroes.
 
         Arguments
         ---------
         model : smif.model.composite.Model
         timestep : int
-        data : dict
 
         Returns
         -------
         results : dict
         """
-        timesteps = sorted(list(data.keys()))
-        timestep_before = element_before(timestep, timesteps)
-        if timestep_before is not None:
-            # last iteration of previous timestep results
-            results = data[timestep_before][model.name]
+        earlier = []
+        if self.warm_start != 'zeros':
+            earlier = sorted(t for t in self._solutions if t < timestep)
+
+        if len(earlier) >= 2 and self.warm_start == 'extrapolate':
+            before, latest = earlier[-2:]
+            previous = self._solutions[before][model.name]
+            results = {}
+            for name, value in self._solutions[latest][model.name].items():
+                if isinstance(value, np.ndarray):
+                    slope = (value - previous[name]) / (latest - before)
+                    results[name] = value + slope * (timestep - latest)
+                else:
+                    results[name] = value
+        elif earlier:
+            # converged results of the latest earlier timestep
+            results = {name: value.copy() if isinstance(value, np.ndarray) else value
+                       for name, value in self._solutions[earlier[-1]][model.name].items()}
         else:
             # generate zero-values for each parameter/region/interval combination
             results = {}
@@ -225,3 +532,12 @@ class ModelSet(CompositeModel):
             )
             for param in model.model_outputs.metadata
         )
+
+
+def _copy_results(model_results):
+    """Copy the arrays in the results of a model
+    """
+    if not isinstance(model_results, dict):
+        return model_results
+    return {name: value.copy() if isinstance(value, np.ndarray) else value
+            for name, value in model_results.items()}
@@ -32,7 +32,8 @@ class ScenarioModel(Model):
     def data(self):
         return self._data
 
-    def add_output(self, name, spatial_resolution, temporal_resolution, units):
+    def add_output(self, name, spatial_resolution, temporal_resolution, units,
+                   aggregation='sum'):
         """Add an output to the scenario model
 
         Arguments
@@ -41,12 +42,15 @@ class ScenarioModel(Model):
         spatial_resolution: :class:`smif.convert.area.RegionRegister`
         temporal_resolution: :class:`smif.convert.interval.TimeIntervalRegister`
         units: str
+        aggregation: str, default='sum'
+            One of ``sum``, ``mean``, ``max`` or ``min``
 
         """
         output_metadata = {"name": name,
                            "spatial_resolution": spatial_resolution,
                            "temporal_resolution": temporal_resolution,
-                           "units": units}
+                           "units": units,
+                           "aggregation": aggregation}
 
         self._model_outputs.add_metadata(output_metadata)
 
@@ -82,7 +82,8 @@ class SectorModel(Model, metaclass=ABCMeta):
         self.logger.debug("Adding %s to user data for %s", value, self.name)
         self._user_data = value
 
-    def add_input(self, name, spatial_resolution, temporal_resolution, units):
+    def add_input(self, name, spatial_resolution, temporal_resolution, units,
+                  aggregation='sum'):
         """Add an input to the sector model
 
         The inputs should be specified in a list.  For example::
@@ -98,16 +99,21 @@ class SectorModel(Model, metaclass=ABCMeta):
         spatial_resolution: :class:`smif.convert.area.RegionSet`
         temporal_resolution: :class:`smif.convert.interval.IntervalSet`
         units: str
+        aggregation: str, default='sum'
+            One of ``sum``, ``mean``, ``max`` or ``min``
 
         """
         input_metadata = {"name": name,
                           "spatial_resolution": spatial_resolution,
                           "temporal_resolution": temporal_resolution,
-                          "units": units}
+                          "units": units,
+                          "aggregation": aggregation}
 
         self._model_inputs.add_metadata(input_metadata)
+        self._invalidate()
 
-    def add_output(self, name, spatial_resolution, temporal_resolution, units):
+    def add_output(self, name, spatial_resolution, temporal_resolution, units,
+                   aggregation='sum'):
         """Add an output to the sector model
 
         Arguments
@@ -116,12 +122,15 @@ class SectorModel(Model, metaclass=ABCMeta):
         spatial_resolution: :class:`smif.convert.area.RegionSet`
         temporal_resolution: :class:`smif.convert.interval.IntervalSet`
         units: str
+        aggregation: str, default='sum'
+            One of ``sum``, ``mean``, ``max`` or ``min``
 
         """
         output_metadata = {"name": name,
                            "spatial_resolution": spatial_resolution,
                            "temporal_resolution": temporal_resolution,
-                           "units": units}
+                           "units": units,
+                           "aggregation": aggregation}
 
         self._model_outputs.add_metadata(output_metadata)
 
@@ -366,11 +375,13 @@ class SectorModelBuilder(object):
                 interval_set = self.interval_register.get_entry(temporal_resolution)
 
                 units = model_input['units']
+                aggregation = model_input.get('aggregation', 'sum')
 
                 self._sector_model.add_input(name,
                                              region_set,
                                              interval_set,
-                                             units)
+                                             units,
+                                             aggregation)
 
     def add_outputs(self, output_dicts):
         """Add outputs to the sector model
@@ -390,11 +401,13 @@ class SectorModelBuilder(object):
                 interval_set = self.interval_register.get_entry(temporal_resolution)
 
                 units = model_output['units']
+                aggregation = model_output.get('aggregation', 'sum')
 
                 self._sector_model.add_output(name,
                                               region_set,
                                               interval_set,
-                                              units)
+                                              units,
+                                              aggregation)
 
     def add_interventions(self, intervention_list):
         """Add interventions to the sector model
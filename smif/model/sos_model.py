@@ -4,7 +4,8 @@ framework.
 
 """
 import logging
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from enum import Enum
 
 import networkx
@@ -15,14 +16,21 @@ from smif.convert.interval import get_register as get_interval_register
 from smif.decision import Planning
 from smif.intervention import Intervention, InterventionRegister
 from smif.model import CompositeModel, Model, element_after, element_before
-from smif.model.model_set import ModelSet
+from smif.model.convergence import ACCELERATORS, get_accelerator
+from smif.model.execution_plan import ExecutionPlan
+from smif.model.model_set import ORDERINGS, WARM_STARTS, ModelSet
 from smif.model.scenario_model import ScenarioModel
 from smif.model.sector_model import SectorModel, SectorModelBuilder
+from smif.model.worker import SectorModelWorker, start_process_pool
 
 __author__ = "Will Usher, Tom Russell"
 __copyright__ = "Will Usher, Tom Russell"
 __license__ = "mit"
 
+EXECUTORS = ('thread', 'process', 'worker')
+
+_Pools = namedtuple('_Pools', ['sector', 'local', 'model_set'])
+
 
 class SosModel(CompositeModel):
     """Consists of the collection of models joined via dependencies
@@ -36,6 +44,41 @@ class SosModel(CompositeModel):
     name : str
         The unique name of the SosModel
 
+    Attributes
+    ----------
+    executor : str, default=None
+        If ``thread`` or ``process``, models with no outstanding dependencies
+        are run concurrently in a pool of threads or processes. Only sector
+        models are run in a process pool; they must be picklable, and any
+        changes they make to their own attributes are not returned. Scenario
+        models and ModelSets run in threads. If ``worker``, each sector
+        model runs in its own persistent process, see
+        :class:`smif.model.worker.SectorModelWorker`, and other models run in
+        a pool of threads. Pools and workers are started on the first
+        timestep and kept until :meth:`close_workers` is called.
+    max_workers : int, default=None
+        The size of the pool, which defaults to that chosen by
+        :mod:`concurrent.futures`
+    convergence_accelerator : str, default=None
+        The accelerator used when iterating each ModelSet to convergence, one
+        of ``none``, ``relaxation``, ``aitken`` or ``anderson``, see
+        :mod:`smif.model.convergence`
+    convergence_relaxation_factor : float, default=None
+        The relaxation factor of the accelerator, if not its default
+    convergence_anderson_depth : int, default=None
+        The number of previous iterations used by Anderson mixing, if not the
+        default
+    convergence_ordering : str, default='jacobi'
+        The ordering of models within each iteration of a ModelSet,
+        ``jacobi`` or ``gauss_seidel``, see :mod:`smif.model.model_set`
+    convergence_full_history : bool, default=False
+        If True, ModelSets keep the results of every iteration for
+        diagnostics, rather than only the last two
+    convergence_warm_start : str, default='previous'
+        The initial estimate for each ModelSet in each timestep,
+        ``previous``, ``extrapolate`` or ``zeros``, see
+        :class:`smif.model.model_set.ModelSet`
+
     """
     def __init__(self, name):
         # housekeeping
@@ -44,10 +87,28 @@ class SosModel(CompositeModel):
         self.max_iterations = 25
         self.convergence_relative_tolerance = 1e-05
         self.convergence_absolute_tolerance = 1e-08
+        self.convergence_accelerator = None
+        self.convergence_relaxation_factor = None
+        self.convergence_anderson_depth = None
+        self.convergence_ordering = 'jacobi'
+        self.convergence_full_history = False
+        self.convergence_warm_start = 'previous'
+        self.executor = None
+        self.max_workers = None
+        self._workers = {}
+        # pools kept for the model run, and the settings they were started for
+        self._pools = None
+        self._pool_settings = None
 
         # models - includes types of SectorModel and ScenarioModel
         self.dependency_graph = networkx.DiGraph()
 
+        # run order compiled on first simulation, and the settings
+        # used for its ModelSets
+        self._run_order = None
+        self._run_order_settings = None
+        self._plan = None
+
         # systems, interventions and (system) state
         self.timesteps = []
         self.interventions = InterventionRegister()
@@ -70,6 +131,13 @@ class SosModel(CompositeModel):
         assert isinstance(model, Model)
         self.logger.info("Loading model: %s", model.name)
         self.models[model.name] = model
+        model._parents.add(self)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._run_order = None
+        self._plan = None
+        super()._invalidate()
 
     @property
     def results(self):
@@ -93,36 +161,232 @@ class SosModel(CompositeModel):
             Nested dict keyed by model name, parameter name
 
         """
-        self.check_dependencies()
-        run_order = self._get_model_sets_in_run_order()
-        self.logger.info("Determined run order as %s", [x.name for x in run_order])
-        results = {}
-        for model in run_order:
-            # get data for model
-            # TODO settle and test data dict structure/object between simple/composite models
-            sim_data = {}
-            for input_name, dep in model.deps.items():
-                input_ = model.model_inputs[input_name]
-                if input_ in self.free_inputs:
-                    # pick external dependencies from data
-                    param_data = data[dep.source_model.name][dep.source.name]
-                else:
-                    # pick internal dependencies from results
-                    param_data = results[dep.source_model.name][dep.source.name]
-                param_data_converted = dep.convert(param_data, input_)
-                sim_data[input_.name] = param_data_converted
+        plan = self.get_execution_plan()
 
-            sim_data = self._get_parameter_values(model, sim_data, data)
+        if self.executor is not None:
+            return self._simulate_concurrently(plan, timestep, data)
 
-            sim_results = model.simulate(timestep, sim_data)
+        results = {}
+        for step in plan:
+            sim_results = step.model.simulate(timestep, step.get_data(results, data))
             for model_name, model_results in sim_results.items():
                 results[model_name] = model_results
         return results
 
+    def _simulate_concurrently(self, plan, timestep, data):
+        """Run each model, or set of interdependent models, in a pool as soon
+        as the models providing its inputs have finished
+
+        Arguments
+        ---------
+        plan : smif.model.execution_plan.ExecutionPlan
+        timestep : int
+        data : dict
+
+        Returns
+        -------
+        results : dict
+            Nested dict keyed by model name, parameter name
+        """
+        if self.executor == 'worker':
+            self._start_workers(plan)
+        pools = self._start_pools()
+        for step in plan:
+            if isinstance(step.model, ModelSet):
+                step.model.pool = pools.model_set
+
+        waiting = {idx: set(step.providers) for idx, step in enumerate(plan.steps)}
+        results = {}
+        running = {}
+        while waiting or running:
+            self._submit_ready(plan, waiting, running, pools, timestep, results, data)
+            self._collect_finished(running, waiting, results)
+        return results
+
+    def _start_pools(self):
+        """Return the pools in which to run models for the executor, starting
+        them on first use
+
+        Pools are kept for the rest of the model run, until
+        :meth:`close_workers`, so no process is forked on later timesteps,
+        when threads of the pools are running.
+
+        Returns
+        -------
+        _Pools
+            The pool for sector models; the local pool for scenario models
+            and ModelSets, which is the same pool unless the executor is
+            ``process``; and the pool for the models within ModelSets
+        """
+        settings = (self.executor, self.max_workers)
+        if self._pools is not None and self._pool_settings != settings:
+            self._shutdown_pools()
+        if self._pools is None:
+            self._pools = self._create_pools()
+            self._pool_settings = settings
+        return self._pools
+
+    def _create_pools(self):
+        """Start the pools in which to run models for the executor
+
+        In ``process`` mode, only sector models, including those within
+        ModelSets, are sent to the process pool, which is started before any
+        thread pool. Scenario models and ModelSets run in threads of this
+        process, so that a ModelSet keeps the solution of each timestep,
+        from which it starts the next.
+        """
+        if self.executor in ('thread', 'worker'):
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            return _Pools(pool, pool, ThreadPoolExecutor(max_workers=self.max_workers))
+        elif self.executor == 'process':
+            pool = start_process_pool(self.max_workers)
+            return _Pools(pool, ThreadPoolExecutor(max_workers=self.max_workers), pool)
+        else:
+            msg = "Executor must be one of {}, not '{}'"
+            raise ValueError(msg.format(", ".join(EXECUTORS), self.executor))
+
+    def _shutdown_pools(self):
+        """Shut down any pools in which models run
+        """
+        if self._pools is not None:
+            for pool in set(self._pools):
+                pool.shutdown()
+        self._pools = None
+        self._pool_settings = None
+
+    def _submit_ready(self, plan, waiting, running, pools, timestep, results, data):
+        """Submit each step whose providers have all finished
+
+        Arguments
+        ---------
+        plan : smif.model.execution_plan.ExecutionPlan
+        waiting : dict
+            Positions of the steps not yet submitted, mapped to the positions
+            of the steps they still wait for
+        running : dict
+            Futures of the submitted steps, mapped to their positions
+        pools : _Pools
+        timestep : int
+        results : dict
+            Results of the steps finished so far
+        data : dict
+        """
+        ready = [idx for idx, providers in waiting.items() if not providers]
+        for idx in ready:
+            del waiting[idx]
+            step = plan.steps[idx]
+            sim_data = step.get_data(results, data)
+            self.logger.debug("Submitting %s", step.name)
+            pool, simulate = self._get_simulate(step.model, pools)
+            running[pool.submit(simulate, timestep, sim_data)] = idx
+
+    def _get_simulate(self, unit, pools):
+        """Return the pool in which to run a model, or set of models, and the
+        function which simulates it
+        """
+        if not isinstance(unit, SectorModel):
+            return pools.local, unit.simulate
+        elif self.executor == 'worker':
+            return pools.sector, self._get_worker(unit).simulate
+        return pools.sector, unit.simulate
+
+    @staticmethod
+    def _collect_finished(running, waiting, results):
+        """Wait for at least one running step to finish, then store its
+        results and release the steps waiting for it
+        """
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            idx = running.pop(future)
+            for model_name, model_results in future.result().items():
+                results[model_name] = model_results
+            for providers in waiting.values():
+                providers.discard(idx)
+
+    def _start_workers(self, plan):
+        """Fork a worker process for each sector model, including those within
+        ModelSets, before any pool starts its threads
+
+        The models within each ModelSet are then simulated by their workers.
+        """
+        for step in plan:
+            if isinstance(step.model, ModelSet):
+                step.model.workers = {model.name: self._get_worker(model)
+                                      for model in step.model.models
+                                      if isinstance(model, SectorModel)}
+            elif isinstance(step.model, SectorModel):
+                self._get_worker(step.model)
+
+    def _get_worker(self, model):
+        """Return the worker process hosting a sector model, starting it on
+        first use
+        """
+        if model.name not in self._workers:
+            self._workers[model.name] = SectorModelWorker(model)
+        return self._workers[model.name]
+
+    def close_workers(self):
+        """Stop any worker processes hosting sector models, and shut down the
+        pools in which models run
+        """
+        for worker in self._workers.values():
+            worker.close()
+        self._workers = {}
+        self._shutdown_pools()
+
+    def _get_run_order(self):
+        """Return the models and model sets in a runnable order
+
+        The dependency graph and run order are compiled on the first call and
+        reused until a model, input or dependency is added, or the
+        settings for its ModelSets change.
+
+        Returns
+        -------
+        list
+            A list of `smif.model.Model` objects
+        """
+        settings = (self.max_iterations,
+                    self.convergence_relative_tolerance,
+                    self.convergence_absolute_tolerance,
+                    self.convergence_accelerator,
+                    self.convergence_relaxation_factor,
+                    self.convergence_anderson_depth,
+                    self.convergence_ordering,
+                    self.convergence_full_history,
+                    self.convergence_warm_start,
+                    self.executor,
+                    self.max_workers)
+        if self._run_order is None or self._run_order_settings != settings:
+            self.check_dependencies()
+            self._run_order = self._get_model_sets_in_run_order()
+            self._run_order_settings = settings
+            self.logger.info("Determined run order as %s",
+                             [x.name for x in self._run_order])
+        return self._run_order
+
+    def get_execution_plan(self):
+        """Return the plan for simulating the contained models
+
+        The plan is compiled from the run order on first use and reused until
+        a model, input, dependency or parameter is added, or the settings for
+        its ModelSets change.
+
+        Returns
+        -------
+        smif.model.execution_plan.ExecutionPlan
+        """
+        run_order = self._get_run_order()
+        if self._plan is None or self._plan.run_order is not run_order:
+            self._plan = ExecutionPlan(self, run_order)
+        return self._plan
+
     def check_dependencies(self):
         """For each contained model, compare dependency list against
         list of available models and build the dependency graph
         """
+        self.dependency_graph = networkx.DiGraph()
+
         if self.free_inputs.names:
             msg = "A SosModel must have all inputs linked to dependencies." \
                   "Define dependencies for %s"
@@ -210,8 +474,8 @@ class SosModel(CompositeModel):
             A list of `smif.model.Model` objects
         """
         if networkx.is_directed_acyclic_graph(self.dependency_graph):
-            # topological sort gives a single list from directed graph, currently
-            # ignoring opportunities to run independent models in parallel
+            # topological sort gives a single list from directed graph; see
+            # _simulate_concurrently for running independent models in parallel
             run_order = networkx.topological_sort(self.dependency_graph, reverse=False)
 
             # list of Models (typically ScenarioModel and SectorModel)
@@ -236,10 +500,37 @@ class SosModel(CompositeModel):
                         models,
                         max_iterations=self.max_iterations,
                         relative_tolerance=self.convergence_relative_tolerance,
-                        absolute_tolerance=self.convergence_absolute_tolerance))
+                        absolute_tolerance=self.convergence_absolute_tolerance,
+                        accelerator=self._get_accelerator(),
+                        ordering=self.convergence_ordering,
+                        executor=self._get_model_set_executor(),
+                        max_workers=self.max_workers,
+                        full_history=self.convergence_full_history,
+                        warm_start=self.convergence_warm_start))
 
         return ordered_sets
 
+    def _get_model_set_executor(self):
+        """Return the pool, ``thread`` or ``process``, in which to run the
+        models of each ModelSet iteration, or None to run them in sequence
+
+        In ``worker`` mode, ModelSets call the workers hosting their models
+        from a pool of threads.
+        """
+        if self.executor == 'worker':
+            return 'thread'
+        return self.executor
+
+    def _get_accelerator(self):
+        """Create the convergence accelerator for a ModelSet, or None for
+        plain fixed-point iteration
+        """
+        if self.convergence_accelerator is None:
+            return None
+        return get_accelerator(self.convergence_accelerator,
+                               factor=self.convergence_relaxation_factor,
+                               depth=self.convergence_anderson_depth)
+
     def determine_running_mode(self):
         """Determines from the config in what mode to run the model
 
@@ -365,6 +656,11 @@ class SosModelBuilder(object):
         self.set_max_iterations(config_data)
         self.set_convergence_abs_tolerance(config_data)
         self.set_convergence_rel_tolerance(config_data)
+        self.set_convergence_accelerator(config_data)
+        self.set_convergence_ordering(config_data)
+        self.set_convergence_full_history(config_data)
+        self.set_convergence_warm_start(config_data)
+        self.set_parallel_executor(config_data)
 
         self.load_models(model_list, timesteps)
         self.load_scenario_models(config_data['scenario_metadata'],
@@ -428,6 +724,74 @@ class SosModelBuilder(object):
             self.sos_model.convergence_relative_tolerance = \
                 config_data['convergence_relative_tolerance']
 
+    def set_convergence_accelerator(self, config_data):
+        """Set the accelerator, and its relaxation factor and depth, for
+        iterating `class`::smif.ModelSet to convergence
+        """
+        if 'convergence_accelerator' in config_data and \
+                config_data['convergence_accelerator'] is not None:
+            accelerator = config_data['convergence_accelerator']
+            if accelerator not in ACCELERATORS:
+                msg = "Accelerator must be one of {}, not '{}'"
+                raise ValueError(msg.format(", ".join(ACCELERATORS), accelerator))
+            self.sos_model.convergence_accelerator = accelerator
+        if 'convergence_relaxation_factor' in config_data and \
+                config_data['convergence_relaxation_factor'] is not None:
+            self.sos_model.convergence_relaxation_factor = \
+                config_data['convergence_relaxation_factor']
+        if 'convergence_anderson_depth' in config_data and \
+                config_data['convergence_anderson_depth'] is not None:
+            self.sos_model.convergence_anderson_depth = \
+                config_data['convergence_anderson_depth']
+
+    def set_convergence_ordering(self, config_data):
+        """Set the ordering, ``jacobi`` or ``gauss_seidel``, of models within
+        each iteration of `class`::smif.ModelSet
+        """
+        if 'convergence_ordering' in config_data and \
+                config_data['convergence_ordering'] is not None:
+            ordering = config_data['convergence_ordering']
+            if ordering not in ORDERINGS:
+                msg = "Ordering must be one of {}, not '{}'"
+                raise ValueError(msg.format(", ".join(ORDERINGS), ordering))
+            self.sos_model.convergence_ordering = ordering
+
+    def set_convergence_full_history(self, config_data):
+        """Set whether `class`::smif.ModelSet keeps the results of every
+        iteration
+        """
+        if 'convergence_full_history' in config_data and \
+                config_data['convergence_full_history'] is not None:
+            self.sos_model.convergence_full_history = \
+                bool(config_data['convergence_full_history'])
+
+    def set_convergence_warm_start(self, config_data):
+        """Set the initial estimate, ``previous``, ``extrapolate`` or
+        ``zeros``, for iterating `class`::smif.ModelSet to convergence
+        """
+        if 'convergence_warm_start' in config_data and \
+                config_data['convergence_warm_start'] is not None:
+            warm_start = config_data['convergence_warm_start']
+            if warm_start not in WARM_STARTS:
+                msg = "Warm start must be one of {}, not '{}'"
+                raise ValueError(msg.format(", ".join(WARM_STARTS), warm_start))
+            self.sos_model.convergence_warm_start = warm_start
+
+    def set_parallel_executor(self, config_data):
+        """Set the pool, ``thread``, ``process`` or ``worker``, and number of
+        workers used to run independent models concurrently
+        """
+        if 'parallel_executor' in config_data and \
+                config_data['parallel_executor'] is not None:
+            executor = config_data['parallel_executor']
+            if executor not in EXECUTORS:
+                msg = "Executor must be one of {}, not '{}'"
+                raise ValueError(msg.format(", ".join(EXECUTORS), executor))
+            self.sos_model.executor = executor
+        if 'parallel_workers' in config_data and \
+                config_data['parallel_workers'] is not None:
+            self.sos_model.max_workers = config_data['parallel_workers']
+
     def load_models(self, model_data_list, timesteps):
         """Loads the sector models into the system-of-systems model
 
@@ -505,7 +869,8 @@ class SosModelBuilder(object):
             scenario.add_output(name,
                                 spatial_res,
                                 temporal_res,
-                                scenario_meta['units'])
+                                scenario_meta['units'],
+                                scenario_meta.get('aggregation', 'sum'))
 
             data = self._data_list_to_array(name,
                                             scenario_data[name],
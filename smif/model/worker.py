@@ -0,0 +1,266 @@
+"""Host a sector model in a persistent worker process
+
+A :class:`SectorModelWorker` forks a process which holds the sector model for
+the whole of a model run, so that models which hold the GIL for long periods
+can run in parallel, and any state they keep between timesteps is preserved.
+
+Arrays are not pickled through the connection to the worker. Instead, the
+parent process allocates one :class:`multiprocessing.shared_memory.SharedMemory`
+block for each numeric input and output, reused across timesteps, and sends
+only the name, shape and data type of each block. Other values, such as
+parameters, are pickled as usual.
+
+Input arrays passed to the sector model are views onto the shared blocks, so
+are only valid for the duration of the call to ``simulate``; a model which
+keeps its inputs must copy them.
+
+Workers need the ``fork`` start method, which is not available on Windows,
+and :mod:`multiprocessing.shared_memory`, from Python 3.8.
+"""
+import logging
+import multiprocessing
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    # before Python 3.8
+    resource_tracker = None
+    SharedMemory = None
+
+__author__ = "Will Usher, Tom Russell"
+__copyright__ = "Will Usher, Tom Russell"
+__license__ = "mit"
+
+
+class SectorModelWorker(object):
+    """Runs a sector model in a persistent forked process
+
+    Arguments
+    ---------
+    model : smif.model.sector_model.SectorModel
+        The sector model, which is copied into the worker process as it is
+        when the worker starts
+    """
+    def __init__(self, model):
+        check_workers_available()
+        self.logger = logging.getLogger(__name__)
+        self.name = model.name
+        self._inputs = {}
+        self._outputs = {}
+        for output in model.model_outputs.metadata:
+            shape = (len(output.get_region_names()), len(output.get_interval_names()))
+            self._outputs[output.name] = _SharedArray(shape, np.dtype(float))
+
+        # share the parent's resource tracker, so blocks attached in the
+        # worker are not reported as leaked when it exits
+        resource_tracker.ensure_running()
+
+        context = multiprocessing.get_context('fork')
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(target=_serve,
+                                        args=(model, child_connection),
+                                        name="smif-{}".format(model.name),
+                                        daemon=True)
+        self._process.start()
+        child_connection.close()
+        self.logger.debug("Started worker process %s for %s",
+                          self._process.pid, self.name)
+
+    def simulate(self, timestep, data=None):
+        """Run the sector model in the worker process
+
+        Arguments
+        ---------
+        timestep : int
+        data : dict, default=None
+
+        Returns
+        -------
+        results : dict
+        """
+        if data is None:
+            data = {}
+        inputs = {name: self._share_input(name, value) for name, value in data.items()}
+        outputs = {name: block.describe() for name, block in self._outputs.items()}
+
+        self._connection.send(('simulate', timestep, inputs, outputs))
+        status, payload = self._connection.recv()
+        if status == 'error':
+            raise RuntimeError("Sector model {} failed in worker process:\n{}".format(
+                self.name, payload))
+
+        results = {}
+        for model_name, model_results in payload.items():
+            if isinstance(model_results, dict):
+                results[model_name] = {
+                    name: self._read_output(name, value)
+                    for name, value in model_results.items()}
+            else:
+                results[model_name] = model_results
+        return results
+
+    def close(self):
+        """Stop the worker process and release the shared memory
+        """
+        if self._process.is_alive():
+            self._connection.send(('close',))
+            self._process.join()
+        self._connection.close()
+        for block in list(self._inputs.values()) + list(self._outputs.values()):
+            block.release()
+        self._inputs = {}
+        self._outputs = {}
+
+    def _share_input(self, name, value):
+        """Copy an array into the shared block for input ``name``, or pass
+        through other values to be pickled
+        """
+        if not isinstance(value, np.ndarray) or value.dtype.hasobject:
+            return ('value', value)
+        block = self._inputs.get(name)
+        if block is None or block.shape != value.shape or block.dtype != value.dtype:
+            if block is not None:
+                block.release()
+            block = _SharedArray(value.shape, value.dtype)
+            self._inputs[name] = block
+        np.copyto(block.array, value)
+        return block.describe()
+
+    def _read_output(self, name, value):
+        """Copy an output out of its shared block, which is reused in the next
+        timestep
+        """
+        if value[0] == 'shared':
+            return self._outputs[name].array.copy()
+        return value[1]
+
+
+def check_workers_available():
+    """Check that sector model workers can run on this platform
+
+    Raises
+    ------
+    RuntimeError
+        If processes cannot be forked, or shared memory is not available
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("Sector model workers need the 'fork' start method, "
+                           "which is not available on this platform")
+    if SharedMemory is None:
+        raise RuntimeError("Sector model workers need multiprocessing.shared_memory, "
+                           "from Python 3.8")
+
+
+def start_process_pool(max_workers=None):
+    """Start a pool of forked processes
+
+    The processes share the region and interval registers of this process,
+    to which pickled models refer by name. All of them are forked before the
+    pool is returned, so none is forked later from a process which may by
+    then be running other threads.
+
+    Arguments
+    ---------
+    max_workers : int, default=None
+        The size of the pool, which defaults to that chosen by
+        :mod:`concurrent.futures`
+
+    Returns
+    -------
+    concurrent.futures.ProcessPoolExecutor
+
+    Raises
+    ------
+    RuntimeError
+        If processes cannot be forked on this platform
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("Process pools need the 'fork' start method, "
+                           "which is not available on this platform")
+    if sys.version_info >= (3, 7):
+        pool = ProcessPoolExecutor(max_workers=max_workers,
+                                   mp_context=multiprocessing.get_context('fork'))
+    else:
+        # pools take no start method before Python 3.7, but fork by default
+        # where fork is available
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+    # the pool forks all of its processes on the first submission
+    pool.submit(int).result()
+    return pool
+
+
+class _SharedArray(object):
+    """A numpy array backed by a shared memory block owned by this process
+    """
+    def __init__(self, shape, dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self._memory = SharedMemory(create=True, size=size)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._memory.buf)
+
+    def describe(self):
+        return ('shared', self._memory.name, self.shape, self.dtype.str)
+
+    def release(self):
+        del self.array
+        self._memory.close()
+        self._memory.unlink()
+
+
+def _serve(model, connection):
+    """Run the sector model on request until told to close
+
+    Shared blocks are attached on first use and kept open while the worker
+    runs, as the parent reuses them across timesteps.
+    """
+    attached = {}
+
+    def view(description):
+        _, name, shape, dtype = description
+        if name not in attached:
+            attached[name] = SharedMemory(name=name)
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=attached[name].buf)
+
+    while True:
+        message = connection.recv()
+        if message[0] == 'close':
+            break
+        _, timestep, inputs, outputs = message
+        try:
+            data = {name: view(value) if value[0] == 'shared' else value[1]
+                    for name, value in inputs.items()}
+            results = model.simulate(timestep, data)
+            payload = {}
+            for model_name, model_results in results.items():
+                if isinstance(model_results, dict):
+                    shared = outputs if model_name == model.name else {}
+                    payload[model_name] = {
+                        name: _write_output(view, shared.get(name), value)
+                        for name, value in model_results.items()}
+                else:
+                    payload[model_name] = model_results
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+        else:
+            connection.send(('ok', payload))
+
+    connection.close()
+
+
+def _write_output(view, description, value):
+    """Write an output into its shared block if it fits, otherwise return it
+    to be pickled
+    """
+    if description is not None and isinstance(value, np.ndarray) \
+            and value.shape == description[2] \
+            and np.can_cast(value.dtype, np.dtype(description[3])):
+        np.copyto(view(description), value)
+        return ('shared',)
+    return ('value', value)
@@ -107,15 +107,18 @@ class ModelRunner(object):
             model_run.sos_model.models[model].before_model_run()
 
         # Solve the models over all timesteps
-        for timestep in model_run.model_horizon:
-            self.logger.debug('Running model for timestep %s', timestep)
-            data = {}
-            data = self._get_parameter_data(model_run)
-            self.logger.debug("Passing parameter data %s into '%s'",
-                              data, model_run.sos_model.name)
-
-            self.results[timestep] = model_run.sos_model.simulate(timestep,
-                                                                  data)
+        try:
+            for timestep in model_run.model_horizon:
+                self.logger.debug('Running model for timestep %s', timestep)
+                data = {}
+                data = self._get_parameter_data(model_run)
+                self.logger.debug("Passing parameter data %s into '%s'",
+                                  data, model_run.sos_model.name)
+
+                self.results[timestep] = model_run.sos_model.simulate(timestep,
+                                                                      data)
+        finally:
+            model_run.sos_model.close_workers()
         return self.results
 
     def _get_parameter_data(self, model_run):
@@ -143,6 +146,8 @@ class ModelRunBuilder(object):
         """
         self._add_timesteps(config_data['timesteps'])
 
+        self.set_conversion_cache(config_data.get('conversion_cache_dir'))
+        self.set_conversion_processes(config_data.get('conversion_processes'))
         self.load_region_sets(config_data['region_sets'])
         self.load_interval_sets(config_data['interval_sets'])
 
@@ -177,6 +182,35 @@ class ModelRunBuilder(object):
         self.logger.info("Adding timesteps to model run")
         self.model_run.model_horizon = timesteps
 
+    def set_conversion_cache(self, cache_dir):
+        """Set the folder in which region and interval conversion coefficients
+        are cached between model runs
+
+        Coefficients are keyed by a hash of the region geometries or interval
+        definitions, so the cache may be shared between model runs.
+
+        Parameters
+        ----------
+        cache_dir: str
+            Path to the cache folder, or None to disable caching
+        """
+        if cache_dir is not None:
+            self.logger.info("Caching conversion coefficients in %s", cache_dir)
+        self.model_run.regions.cache_dir = cache_dir
+        self.model_run.intervals.cache_dir = cache_dir
+
+    def set_conversion_processes(self, processes):
+        """Set the number of processes used to compute region conversion
+        coefficients
+
+        Parameters
+        ----------
+        processes: int
+            Number of worker processes, or None to compute coefficients in
+            this process
+        """
+        self.model_run.regions.processes = processes
+
     def load_region_sets(self, region_sets):
         """Loads the region sets into the system-of-system model
 
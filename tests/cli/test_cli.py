@@ -3,16 +3,23 @@
 
 import os
 import subprocess
+import sys
+import time
 from tempfile import TemporaryDirectory
 from unittest.mock import call, patch
 
 import smif
-from pytest import raises
+from pytest import mark, raises
 from smif.cli import (confirm, parse_arguments, setup_project_folder,
                       validate_config)
 from smif.data_layer.validate import VALIDATION_ERRORS
 
 
+"""Maximum time in seconds for the smif command to start and parse arguments
+"""
+STARTUP_BUDGET = 2.0
+
+
 def get_args(args):
     """Get args object from list of strings
     """
@@ -193,6 +200,36 @@ def test_version_display():
     assert smif.__version__ in str(output.stdout)
 
 
+def test_lazy_imports():
+    """Expect the CLI to import heavy dependencies only when a command needs them
+    """
+    code = "import sys, smif.cli; print(' '.join(sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                            check=True)
+    modules = output.stdout.decode('utf-8').split()
+    for name in ['networkx', 'numpy', 'scipy', 'rtree', 'shapely', 'isodate',
+                 'pint', 'fiona', 'smif.modelrun']:
+        assert name not in modules
+
+
+@mark.parametrize('arguments', [['-V'],
+                                ['setup', '--help'],
+                                ['validate', '--help'],
+                                ['run', '--help']])
+@mark.skipif(not os.environ.get('SMIF_BENCHMARK'),
+             reason="timing benchmark, run with SMIF_BENCHMARK=1")
+def test_startup_budget(arguments):
+    """Expect each subcommand to start within the startup budget
+
+    Wall-clock time depends on the machine, so this only runs on request;
+    test_lazy_imports guards against heavy imports at startup.
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'smif.cli'] + arguments,
+                   stdout=subprocess.PIPE, check=True)
+    assert time.perf_counter() - start < STARTUP_BUDGET
+
+
 def test_verbose_debug():
     """Expect debug message from `smif -vv`
     """
@@ -1,9 +1,13 @@
 """Test aggregation/disaggregation of data between sets of areas
 """
 import numpy as np
+import pytest
 from pytest import fixture, raises
 from shapely.geometry import shape
-from smif.convert.area import (RegionRegister, RegionSet, get_register,
+from smif.convert import area
+from smif.convert.area import (RegionRegister, RegionSet,
+                               bulk_intersection_coefficients, get_register,
+                               intersection_coefficients,
                                proportion_of_a_intersecting_b)
 
 
@@ -278,3 +282,234 @@ class TestRegionRegister():
         converted = rreg.convert(data, 'half_triangles', 'half_squares')
         expected = np.array([0.375, 0.625])
         np.testing.assert_equal(converted, expected)
+
+    def test_coefficients_square_to_triangle(self):
+        rreg = get_register()
+
+        actual = rreg.get_coefficients('half_squares', 'half_triangles')
+        expected = np.array([[0.75, 0.25],
+                             [0.25, 0.75]])
+        np.testing.assert_equal(actual.toarray(), expected)
+
+    def test_coefficients_positional(self):
+        """Coefficients are indexed by the position of each region in its set,
+        whatever the order of the regions in each set
+        """
+        def rectangles(name, bounds):
+            return RegionSet(name, [
+                {
+                    'type': 'Feature',
+                    'properties': {'name': region_name},
+                    'geometry': {
+                        'type': 'Polygon',
+                        'coordinates': [[[x0, 0], [x0, 1], [x1, 1], [x1, 0]]]
+                    }
+                } for region_name, x0, x1 in bounds])
+
+        rreg = RegionRegister()
+        rreg.register(rectangles('strips', [('a', 0, 1), ('b', 1, 2), ('c', 2, 3)]))
+        rreg.register(rectangles('strips_permuted',
+                                 [('c', 2, 3), ('a', 0, 1), ('b', 1, 2)]))
+        rreg.register(rectangles('halves_reversed', [('right', 1.5, 3), ('left', 0, 1.5)]))
+        data = np.array([1., 2., 4.])
+
+        actual = rreg.get_coefficients('strips', 'strips_permuted')
+        np.testing.assert_equal(actual.toarray(), np.array([[0, 0, 1],
+                                                            [1, 0, 0],
+                                                            [0, 1, 0]]))
+        np.testing.assert_equal(rreg.convert(data, 'strips', 'strips_permuted'),
+                                np.array([4., 1., 2.]))
+
+        actual = rreg.get_coefficients('strips', 'halves_reversed')
+        np.testing.assert_equal(actual.toarray(), np.array([[0, 0.5, 1],
+                                                            [1, 0.5, 0]]))
+        np.testing.assert_equal(rreg.convert(data, 'strips', 'halves_reversed'),
+                                np.array([5., 2.]))
+
+        actual = rreg.get_coefficients('halves_reversed', 'strips_permuted')
+        np.testing.assert_allclose(actual.toarray(), np.array([[2 / 3, 0],
+                                                               [0, 2 / 3],
+                                                               [1 / 3, 1 / 3]]))
+        np.testing.assert_allclose(
+            rreg.convert(np.array([3., 6.]), 'halves_reversed', 'strips_permuted'),
+            np.array([2., 4., 3.]))
+
+    def test_convert_mean(self):
+        rreg = get_register()
+
+        converted = rreg.convert(np.array([3]), 'rect', 'half_squares')
+        np.testing.assert_equal(converted, np.array([1.5, 1.5]))
+
+        coefficients = rreg.get_coefficients('rect', 'half_squares', 'mean')
+        np.testing.assert_equal(coefficients.dot(np.array([3])), np.array([3, 3]))
+
+        coefficients = rreg.get_coefficients('half_squares', 'rect', 'mean')
+        np.testing.assert_equal(coefficients.dot(np.array([2, 3])), np.array([2.5]))
+
+        coefficients = rreg.get_coefficients('half_squares', 'half_triangles', 'mean')
+        np.testing.assert_allclose(coefficients.dot(np.array([0, 1])),
+                                   np.array([0.25, 0.75]))
+
+    def test_coefficients_max(self):
+        rreg = get_register()
+
+        actual = rreg.get_coefficients('half_squares', 'rect', 'max')
+        np.testing.assert_equal(actual.toarray(), np.array([[1, 1]]))
+        assert rreg.get_coefficients('half_squares', 'rect', 'max') is actual
+
+    def test_coefficients_computed_on_demand(self, regions_half_squares, regions_rect):
+        rreg = RegionRegister()
+        rreg.register(regions_half_squares)
+        rreg.register(regions_rect)
+        assert 'rect' not in rreg._conversions['half_squares']
+
+        rreg.convert(np.ones(2), 'half_squares', 'rect')
+        assert 'rect' in rreg._conversions['half_squares']
+        assert 'half_squares' not in rreg._conversions['rect']
+
+    def test_coefficients_cached_on_disk(self, regions_half_squares, regions_rect, tmpdir):
+        rreg = RegionRegister()
+        rreg.cache_dir = str(tmpdir)
+        rreg.register(regions_half_squares)
+        rreg.register(regions_rect)
+
+        expected = rreg.get_coefficients('half_squares', 'rect')
+        assert len(tmpdir.listdir()) == 1
+
+        def fail(from_set, to_set):
+            raise AssertionError("Coefficients should be read from cache")
+
+        other = RegionRegister()
+        other.cache_dir = str(tmpdir)
+        other._conversion_coefficients = fail
+        other.register(regions_half_squares)
+        other.register(regions_rect)
+
+        actual = other.get_coefficients('half_squares', 'rect')
+        np.testing.assert_equal(actual.toarray(), expected.toarray())
+
+    def test_failed_cache_write(self, regions_half_squares, regions_rect, tmpdir,
+                                monkeypatch):
+        """A failed write to the cache leaves no temporary file behind, and
+        the coefficients are still returned
+        """
+        def fail(*args):
+            raise OSError("disk full")
+
+        expected = get_register().get_coefficients('half_squares', 'rect')
+        for name in ['save_npz', 'os.replace']:
+            with monkeypatch.context() as patch:
+                patch.setattr('smif.convert.register.' + name, fail)
+                rreg = RegionRegister()
+                rreg.cache_dir = str(tmpdir)
+                rreg.register(regions_half_squares)
+                rreg.register(regions_rect)
+
+                actual = rreg.get_coefficients('half_squares', 'rect')
+            np.testing.assert_equal(actual.toarray(), expected.toarray())
+            assert tmpdir.listdir() == []
+
+    def test_digest_changes_with_geometry(self, regions_half_squares, regions_rect):
+        assert regions_half_squares.digest != regions_rect.digest
+        digest = regions_rect.digest
+        regions_rect.data = [
+            {
+                'type': 'Feature',
+                'properties': {'name': 'zero'},
+                'geometry': {
+                    'type': 'Polygon',
+                    'coordinates': [[[0, 0], [0, 3], [1, 3], [1, 0]]]
+                }
+            }
+        ]
+        assert regions_rect.digest != digest
+
+    def test_parallel_coefficients(self, regions_half_squares, regions_half_triangles):
+        rreg = RegionRegister()
+        rreg.register(regions_half_squares)
+        rreg.register(regions_half_triangles)
+        expected = rreg.get_coefficients('half_squares', 'half_triangles')
+
+        parallel = RegionRegister()
+        parallel.processes = 2
+        parallel.register(regions_half_squares)
+        parallel.register(regions_half_triangles)
+        actual = parallel.get_coefficients('half_squares', 'half_triangles')
+
+        np.testing.assert_allclose(actual.toarray(), expected.toarray())
+
+    def test_parallel_coefficients_without_initializer(self, monkeypatch,
+                                                       regions_half_squares,
+                                                       regions_half_triangles):
+        """Before Python 3.7, the from_regions are sent with every chunk
+        """
+        rreg = RegionRegister()
+        rreg.register(regions_half_squares)
+        rreg.register(regions_half_triangles)
+        expected = rreg.get_coefficients('half_squares', 'half_triangles')
+
+        monkeypatch.setattr(area, '_POOL_INITIALIZER', False)
+        parallel = RegionRegister()
+        parallel.processes = 2
+        parallel.register(regions_half_squares)
+        parallel.register(regions_half_triangles)
+        actual = parallel.get_coefficients('half_squares', 'half_triangles')
+
+        np.testing.assert_allclose(actual.toarray(), expected.toarray())
+
+
+def test_bulk_matches_pairwise(regions_half_squares, regions_half_triangles):
+    """Vectorised and pair-by-pair coefficient calculations agree
+    """
+    pytest.importorskip('shapely', minversion='2.0')
+    from_shapes = [region.shape for region in regions_half_squares]
+    to_shapes = [region.shape for region in regions_half_triangles]
+
+    expected = intersection_coefficients(from_shapes,
+                                         regions_half_squares.intersection_positions,
+                                         to_shapes)
+    actual = bulk_intersection_coefficients(from_shapes, to_shapes)
+
+    expected = sorted(zip(*expected))
+    actual = sorted(zip(*actual))
+    assert [pair[:2] for pair in actual] == [pair[:2] for pair in expected]
+    np.testing.assert_allclose([pair[2] for pair in actual],
+                               [pair[2] for pair in expected])
+
+
+def test_bulk_zero_area(regions_half_squares):
+    """Zero-area from regions fail loudly, as they do pair by pair
+    """
+    pytest.importorskip('shapely', minversion='2.0')
+    line = shape({'type': 'LineString', 'coordinates': [[0, 0], [0, 1]]})
+    to_shapes = [region.shape for region in regions_half_squares]
+
+    with raises(ZeroDivisionError):
+        proportion_of_a_intersecting_b(line, to_shapes[0])
+    with raises(ZeroDivisionError):
+        bulk_intersection_coefficients([line], to_shapes)
+
+
+def test_worker_chunks_share_tree(regions_half_squares, regions_half_triangles):
+    """Each worker indexes the from_shapes once, for all of its chunks
+    """
+    pytest.importorskip('shapely', minversion='2.0')
+    from shapely import STRtree
+    from_wkbs = [region.shape.wkb for region in regions_half_squares]
+    to_wkbs = [region.shape.wkb for region in regions_half_triangles]
+
+    area._init_intersection_worker(from_wkbs)
+    try:
+        _, tree = area._WORKER_REGIONS
+        assert isinstance(tree, STRtree)
+        chunks = [area._intersect_chunk(to_wkbs[:1], 0),
+                  area._intersect_chunk(to_wkbs[1:], 1)]
+        assert area._WORKER_REGIONS[1] is tree
+    finally:
+        area._WORKER_REGIONS = None
+
+    actual = sorted(zip(*[np.concatenate(part) for part in zip(*chunks)]))
+    expected = sorted(zip(*bulk_intersection_coefficients(
+        [region.shape for region in regions_half_squares],
+        [region.shape for region in regions_half_triangles])))
+    np.testing.assert_allclose(actual, expected)
@@ -267,3 +267,57 @@ class TestSpaceTimeConvertorBoth:
         )
         expected = np.ones((1, 4)) * 3  # area zero, seasons 1-4
         assert np.allclose(actual, expected)
+
+    def test_convert_stacked_timesteps(self):
+        data = np.ones((3, 2, 12)) / 2  # timesteps 1-3, area a,b, months 1-12
+        data[1] *= 2
+        data[2] *= 3
+
+        convertor = SpaceTimeConvertor()
+        actual = convertor.convert(
+            data,
+            'half_squares',
+            'rect',
+            'months',
+            'seasons'
+        )
+        expected = np.ones((3, 1, 4)) * 3  # timesteps 1-3, area zero, seasons 1-4
+        expected[1] *= 2
+        expected[2] *= 3
+        assert np.allclose(actual, expected)
+
+
+class TestConversionOperator:
+
+    def test_operator_reused(self):
+        convertor = SpaceTimeConvertor()
+        operator = convertor.get_operator('half_squares', 'rect', 'months', 'seasons')
+
+        actual = operator(np.ones((2, 12)) / 2)
+        expected = np.ones((1, 4)) * 3
+        assert np.allclose(actual, expected)
+
+        actual = operator(np.ones((2, 12)))
+        expected = np.ones((1, 4)) * 6
+        assert np.allclose(actual, expected)
+
+    def test_operator_scale(self):
+        convertor = SpaceTimeConvertor()
+        operator = convertor.get_operator('half_squares', 'half_squares',
+                                          'months', 'months', scale=1e-3)
+
+        data = np.ones((2, 12))
+        actual = operator(data)
+        expected = np.ones((2, 12)) * 1e-3
+        assert np.allclose(actual, expected)
+        assert np.all(data == 1)
+
+    def test_operator_offset(self):
+        convertor = SpaceTimeConvertor()
+        operator = convertor.get_operator('half_squares', 'half_squares',
+                                          'months', 'months', offset=273.15)
+
+        data = np.zeros((2, 12), dtype=int)
+        actual = operator(data)
+        assert np.allclose(actual, np.full((2, 12), 273.15))
+        assert np.all(data == 0)
@@ -4,7 +4,10 @@ from collections import OrderedDict
 import numpy as np
 from numpy.testing import assert_equal
 from pytest import fixture, raises
-from smif.convert.interval import Interval, IntervalSet, TimeIntervalRegister
+from scipy.sparse import issparse
+from smif.convert.interval import (_DURATION_SECONDS, Interval, IntervalSet,
+                                   TimeIntervalRegister, duration_to_hours,
+                                   duration_to_seconds)
 
 
 @fixture(scope='function')
@@ -285,6 +288,41 @@ class TestInterval:
 
         assert actual == [(0, 1), (2, 3), (5, 7)]
 
+    def test_hours_cached_as_array(self):
+
+        interval = Interval('test', [('PT2H', 'PT3H'), ('PT0H', 'PT1H')])
+        actual = interval.hours
+
+        assert actual.dtype == np.int32
+        assert_equal(actual, np.array([[0, 1], [2, 3]]))
+        assert interval.hours is actual
+
+    def test_hours_recomputed_on_set_interval(self):
+
+        interval = Interval('test', ('PT0H', 'PT1H'))
+        interval.interval = ('PT5H', 'PT7H')
+
+        assert_equal(interval.hours, np.array([[0, 1], [5, 7]]))
+        assert interval.to_hours() == [(0, 1), (5, 7)]
+
+    def test_duration_to_hours_memoised(self):
+
+        assert duration_to_hours('P1M') == 744
+        assert ('P1M', 2010) in _DURATION_SECONDS
+        assert duration_to_hours('P1Y', 2010) == 8760
+
+    def test_duration_to_seconds_keeps_minutes(self):
+
+        assert duration_to_seconds('PT30M') == 1800
+        assert duration_to_seconds('PT1H30M') == 5400
+        assert duration_to_hours('PT1H30M') == 1
+
+    def test_seconds(self):
+
+        interval = Interval('test', [('PT0H', 'PT30M'), ('PT1H', 'PT1H30M')])
+        assert_equal(interval.seconds, np.array([[0, 1800], [3600, 5400]]))
+        assert_equal(interval.hours, np.array([[0, 0], [1, 1]]))
+
     def test_str_one_interval(self):
         interval = Interval('test', ('P2M', 'P3M'))
         actual = str(interval)
@@ -347,6 +385,162 @@ class TestTimeRegisterConversion:
 
         assert np.allclose(actual, expected, rtol=1e-05, atol=1e-08)
 
+    def test_coefficients_cached(self, months, seasons):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('months', months))
+        register.register(IntervalSet('seasons', seasons))
+
+        coefficients = register.get_coefficients('months', 'seasons')
+        assert issparse(coefficients)
+        assert coefficients.shape == (4, 12)
+        assert register.get_coefficients('months', 'seasons') is coefficients
+
+        expected = np.zeros((4, 12))
+        expected[0, [0, 1, 11]] = 1
+        expected[1, [2, 3, 4]] = 1
+        expected[2, [5, 6, 7]] = 1
+        expected[3, [8, 9, 10]] = 1
+        assert np.allclose(coefficients.toarray(), expected)
+
+
+class TestAggregation:
+
+    def test_mean_months_to_seasons(self, months, seasons):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('months', months))
+        register.register(IntervalSet('seasons', seasons))
+
+        prices = np.full(12, 870.0)
+        actual = register.get_coefficients('months', 'seasons', 'mean').dot(prices)
+        assert np.allclose(actual, np.full(4, 870.0))
+
+        prices = np.arange(12, dtype=float)
+        actual = register.get_coefficients('months', 'seasons', 'mean').dot(prices)
+        # winter is December, January and February, weighted by their days
+        assert np.isclose(actual[0], (31 * 11 + 31 * 0 + 28 * 1) / 90)
+        assert np.isclose(actual[1], (31 * 2 + 30 * 3 + 31 * 4) / 92)
+
+    def test_mean_fills(self, twenty_four_hours, one_day):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('hourly_day', twenty_four_hours))
+        register.register(IntervalSet('one_day', one_day))
+
+        coefficients = register.get_coefficients('one_day', 'hourly_day', 'mean')
+        assert np.allclose(coefficients.dot([870]), np.full(24, 870))
+
+        coefficients = register.get_coefficients('hourly_day', 'one_day', 'mean')
+        assert np.allclose(coefficients.dot(np.arange(24)), [11.5])
+
+    def test_mean_uncovered_is_zero(self, months, one_day):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('months', months))
+        register.register(IntervalSet('one_day', one_day))
+
+        coefficients = register.get_coefficients('one_day', 'months', 'mean')
+        expected = np.zeros(12)
+        expected[0] = 5
+        assert np.allclose(coefficients.dot([5]), expected)
+
+    def test_max_pattern(self, twenty_four_hours, one_day):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('hourly_day', twenty_four_hours))
+        register.register(IntervalSet('one_day', one_day))
+
+        pattern = register.get_coefficients('hourly_day', 'one_day', 'max')
+        assert_equal(pattern.toarray(), np.ones((1, 24)))
+        assert register.get_coefficients('hourly_day', 'one_day', 'max') is pattern
+
+    def test_unknown_aggregation(self, months, seasons):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('months', months))
+        register.register(IntervalSet('seasons', seasons))
+
+        with raises(ValueError):
+            register.get_coefficients('months', 'seasons', 'median')
+
+
+class TestResolution:
+
+    @fixture(scope='function')
+    def half_hours(self):
+        return [{'id': '1_{}'.format(idx),
+                 'start': 'PT{}M'.format(idx * 30),
+                 'end': 'PT{}M'.format((idx + 1) * 30)}
+                for idx in range(48)]
+
+    def test_register_resolution(self, months, half_hours):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('months', months))
+        assert register.resolution == 86400
+
+        register.register(IntervalSet('half_hourly_day', half_hours))
+        assert register.resolution == 1800
+
+    def test_convert_half_hours_to_hours(self, half_hours, twenty_four_hours):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('half_hourly_day', half_hours))
+        register.register(IntervalSet('hourly_day', twenty_four_hours))
+
+        data = np.arange(48)
+        actual = register.convert(data, 'half_hourly_day', 'hourly_day')
+        expected = data[0::2] + data[1::2]
+        assert np.allclose(actual, expected)
+
+        actual = register.convert(np.ones(24), 'hourly_day', 'half_hourly_day')
+        assert np.allclose(actual, np.full(48, 0.5))
+
+    def test_explicit_resolution(self, months, seasons, monthly_data,
+                                 monthly_data_as_seasons):
+        register = TimeIntervalRegister()
+        register.resolution = 3600
+        register.register(IntervalSet('months', months))
+        register.register(IntervalSet('seasons', seasons))
+        assert register.resolution == 3600
+
+        actual = register.convert(monthly_data, 'months', 'seasons')
+        assert np.allclose(actual, monthly_data_as_seasons)
+
+    def test_explicit_resolution_too_coarse(self, months, half_hours):
+        register = TimeIntervalRegister()
+        register.register(IntervalSet('half_hourly_day', half_hours))
+        with raises(ValueError):
+            register.resolution = 3600
+
+        register = TimeIntervalRegister()
+        register.resolution = 3600
+        with raises(ValueError):
+            register.register(IntervalSet('half_hourly_day', half_hours))
+
+
+class TestCoefficientCache:
+
+    def test_coefficients_cached_on_disk(self, months, seasons, tmpdir):
+        register = TimeIntervalRegister()
+        register.cache_dir = str(tmpdir)
+        register.register(IntervalSet('months', months))
+        register.register(IntervalSet('seasons', seasons))
+
+        expected = register.get_coefficients('months', 'seasons')
+        assert len(tmpdir.listdir()) == 1
+
+        def fail(from_set, to_set):
+            raise AssertionError("Coefficients should be read from cache")
+
+        other = TimeIntervalRegister()
+        other.cache_dir = str(tmpdir)
+        other._conversion_coefficients = fail
+        other.register(IntervalSet('months', months))
+        other.register(IntervalSet('seasons', seasons))
+
+        actual = other.get_coefficients('months', 'seasons')
+        assert np.allclose(actual.toarray(), expected.toarray())
+
+    def test_digest(self, months, seasons):
+        assert IntervalSet('months', months).digest == IntervalSet('other', months).digest
+        assert IntervalSet('months', months).digest != IntervalSet('seasons', seasons).digest
+        assert IntervalSet('months', months).digest != \
+            IntervalSet('months', months, base_year=2012).digest
+
 
 class TestIntervalSet:
 
@@ -465,13 +659,47 @@ class TestRemapConvert:
 
 class TestValidation:
 
-    def test_validate_get_hourly_array(self, remap_months):
+    def test_validate_get_slot_array(self, remap_months):
         intervals = IntervalSet('remap_months', remap_months)
 
-        actual = intervals._get_hourly_array()
-        expected = np.ones(8760, dtype=np.int)
+        actual = intervals._get_slot_array()
+        expected = np.ones(365, dtype=int)
+        assert intervals.resolution == 86400
         assert_equal(actual, expected)
 
+    def test_slot_owner(self, seasons):
+        intervals = IntervalSet('seasons', seasons)
+
+        owner = intervals.slot_owner(3600)
+        assert owner.dtype == np.int32
+        assert len(owner) == 8760
+        assert owner[0] == 0  # winter
+        assert owner[1416] == 1  # spring
+        assert owner[8759] == 0  # winter
+        assert_equal(intervals.hour_counts, [2160, 2208, 2208, 2184])
+        assert intervals.hour_counts.sum() == 8760
+
+    def test_slot_weights_finer_resolution(self, seasons):
+        intervals = IntervalSet('seasons', seasons)
+
+        assert np.isclose(intervals.slot_weights().sum(), 4)
+        assert np.isclose(intervals.slot_weights(1800).sum(), 4)
+        assert len(intervals.slot_weights(1800)) == 17520
+
+    def test_slot_owner_uncovered(self, one_day):
+        intervals = IntervalSet('one_day', one_day)
+
+        owner = intervals.slot_owner(3600)
+        assert_equal(owner[:24], np.zeros(24))
+        assert_equal(owner[24:], -np.ones(8736))
+        assert_equal(intervals.hour_counts, [24])
+
+    def test_slot_owner_too_coarse(self, one_day):
+        intervals = IntervalSet('one_day', one_day)
+
+        with raises(ValueError):
+            intervals.slot_owner(7 * 86400)
+
     def test_validate_intervals_passes(self, remap_months):
 
         register = TimeIntervalRegister()
@@ -1,5 +1,9 @@
+import subprocess
+import sys
 from unittest.mock import patch
-from smif.convert.unit import parse_unit
+
+from pytest import approx, raises
+from smif.convert.unit import _PARSED_UNITS, conversion_factors, parse_unit
 
 
 def test_parse_unit_valid():
@@ -9,6 +13,21 @@ def test_parse_unit_valid():
     assert str(meter) == 'meter'
 
 
+def test_parse_unit_memoised():
+    """Parse each unit string only once
+    """
+    meter = parse_unit('m')
+    assert 'm' in _PARSED_UNITS
+    assert parse_unit('m') is meter
+
+
+def test_registry_built_lazily():
+    """Importing metadata should not import pint
+    """
+    code = "import sys, smif.metadata; assert 'pint' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
 @patch('smif.convert.unit.LOGGER.warning')
 def test_parse_unit_invalid(warning_logger):
     """Warn if unit not recognised
@@ -17,3 +36,22 @@ def test_parse_unit_invalid(warning_logger):
     parse_unit(unit)
     msg = "Unrecognised unit: %s"
     warning_logger.assert_called_with(msg, unit)
+
+
+def test_conversion_factors():
+    """Derive multiplier and offset between compatible units
+    """
+    assert conversion_factors('kWh', 'GWh') == (approx(1e-6), approx(0))
+    assert conversion_factors('kilowatt_hour', 'megajoule') == (approx(3.6), approx(0))
+    assert conversion_factors('degC', 'kelvin') == (approx(1), approx(273.15))
+
+
+def test_conversion_factors_incompatible():
+    """Raise if units cannot be converted
+    """
+    with raises(ValueError) as ex:
+        conversion_factors('kWh', 'm')
+    assert "Cannot convert from kWh to m" in str(ex)
+
+    with raises(ValueError):
+        conversion_factors('kWh', 'unrecognisable')
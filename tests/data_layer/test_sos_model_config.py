@@ -34,6 +34,88 @@ class TestSosModelReader():
         assert reader.data["convergence_relative_tolerance"] == 0.0001
         assert reader.data["convergence_max_iterations"] == 1000
 
+    def test_read_conversion_cache_dir(self, setup_project_folder):
+        reader = self._get_reader(setup_project_folder)
+        reader.load()
+        assert reader.data["conversion_cache_dir"] is None
+
+        reader._config["conversion_cache_dir"] = "../cache"
+        expected = os.path.join(str(setup_project_folder), "cache")
+        assert reader.load_conversion_cache_dir() == expected
+
+    def test_read_conversion_processes(self, setup_project_folder):
+        reader = self._get_reader(setup_project_folder)
+        reader.load()
+        assert reader.data["conversion_processes"] is None
+
+        reader._config["conversion_processes"] = 4
+        assert reader.load_conversion_processes() == 4
+
+    def test_read_convergence_accelerator(self, setup_project_folder):
+        reader = self._get_reader(setup_project_folder)
+        reader.load()
+        assert reader.data["convergence_accelerator"] is None
+        assert reader.data["convergence_relaxation_factor"] is None
+        assert reader.data["convergence_anderson_depth"] is None
+
+        reader._config["convergence_accelerator"] = "anderson"
+        reader._config["convergence_relaxation_factor"] = 0.8
+        reader._config["convergence_anderson_depth"] = 3
+        assert reader.load_convergence_accelerator() == "anderson"
+        assert reader.load_convergence_relaxation_factor() == 0.8
+        assert reader.load_convergence_anderson_depth() == 3
+
+        # unknown names are passed on, to be rejected by the builder
+        reader._config["convergence_accelerator"] = "andersen"
+        assert reader.load_convergence_accelerator() == "andersen"
+
+    def test_read_convergence_ordering(self, setup_project_folder):
+        reader = self._get_reader(setup_project_folder)
+        reader.load()
+        assert reader.data["convergence_ordering"] is None
+
+        reader._config["convergence_ordering"] = "gauss_seidel"
+        assert reader.load_convergence_ordering() == "gauss_seidel"
+
+        # unknown names are passed on, to be rejected by the builder
+        reader._config["convergence_ordering"] = "gauss-seidel"
+        assert reader.load_convergence_ordering() == "gauss-seidel"
+
+    def test_read_convergence_full_history(self, setup_project_folder):
+        reader = self._get_reader(setup_project_folder)
+        reader.load()
+        assert reader.data["convergence_full_history"] is None
+
+        reader._config["convergence_full_history"] = True
+        assert reader.load_convergence_full_history() is True
+
+    def test_read_convergence_warm_start(self, setup_project_folder):
+        reader = self._get_reader(setup_project_folder)
+        reader.load()
+        assert reader.data["convergence_warm_start"] is None
+
+        reader._config["convergence_warm_start"] = "extrapolate"
+        assert reader.load_convergence_warm_start() == "extrapolate"
+
+        # unknown names are passed on, to be rejected by the builder
+        reader._config["convergence_warm_start"] = "last"
+        assert reader.load_convergence_warm_start() == "last"
+
+    def test_read_parallel_executor(self, setup_project_folder):
+        reader = self._get_reader(setup_project_folder)
+        reader.load()
+        assert reader.data["parallel_executor"] is None
+        assert reader.data["parallel_workers"] is None
+
+        reader._config["parallel_executor"] = "process"
+        reader._config["parallel_workers"] = 4
+        assert reader.load_parallel_executor() == "process"
+        assert reader.load_parallel_workers() == 4
+
+        # unknown names are passed on, to be rejected by the builder
+        reader._config["parallel_executor"] = "threads"
+        assert reader.load_parallel_executor() == "threads"
+
     def test_model_list(self, setup_project_folder):
 
         reader = self._get_reader(setup_project_folder)
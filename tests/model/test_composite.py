@@ -360,6 +360,37 @@ class TestNestedModels():
         assert sos_model_high.free_inputs['electricity_demand_input'] == \
             input_object
 
+    def test_free_inputs_cached(self, get_sector_model, get_scenario):
+        SectorModel = get_sector_model
+        energy_model = SectorModel('energy_sector_model')
+        energy_model.add_input('electricity_demand_input', Mock(), Mock(), 'unit')
+
+        sos_model = SosModel('lower')
+        sos_model.add_model(energy_model)
+
+        free_inputs = sos_model.free_inputs
+        assert energy_model.free_inputs is energy_model.free_inputs
+        assert sos_model.free_inputs is free_inputs
+
+        # adding an input to a contained model
+        energy_model.add_input('fluffiness_input', Mock(), Mock(), 'unit')
+        assert sorted(energy_model.free_inputs.names) == \
+            ['electricity_demand_input', 'fluffiness_input']
+        assert sorted(sos_model.free_inputs.names) == \
+            ['electricity_demand_input', 'fluffiness_input']
+
+        # adding a model
+        scenario = get_scenario
+        sos_model.add_model(scenario)
+        assert sos_model.free_inputs is not free_inputs
+
+        # adding a dependency to a contained model
+        energy_model.add_dependency(scenario,
+                                    'electricity_demand_output',
+                                    'electricity_demand_input')
+        assert energy_model.free_inputs.names == ['fluffiness_input']
+        assert sos_model.free_inputs.names == ['fluffiness_input']
+
     @pytest.mark.xfail(reason="Nested sosmodels not yet implemented")
     def test_nested_graph(self, get_sector_model):
         """If we add a nested model, all Sectormodel and ScenarioModel objects
@@ -507,7 +538,7 @@ class TestCircularDependency:
         assert (energy_model, water_model) in graph.edges()
 
         modelset = ModelSet([water_model, energy_model], sos_model)
-        actual = modelset.guess_results(water_model, 2010, {})
+        actual = modelset.guess_results(water_model, 2010)
         expected = {'electricity_demand': np.array([1.])}
         # assert actual == expected
 
@@ -0,0 +1,89 @@
+import numpy as np
+from numpy.testing import assert_allclose
+from pytest import fixture, mark, raises
+from smif.model.convergence import (Accelerator, Aitken, Anderson, Relaxation,
+                                    get_accelerator)
+
+
+@fixture
+def linear_problem():
+    """A contracting linear map g(x) = Ax + b, with fixed point x = 1
+    """
+    matrix = np.array([[0.5, 0.4, 0.0],
+                       [0.3, 0.0, 0.6],
+                       [0.0, 0.8, 0.1]])
+    offset = np.ones(3) - matrix.dot(np.ones(3))
+    return lambda x: matrix.dot(x) + offset
+
+
+def iterations_to_converge(accelerator, function, max_iterations=500):
+    estimate = np.zeros(3)
+    for i in range(max_iterations):
+        output = function(estimate)
+        if np.allclose(output, estimate, rtol=1e-08, atol=1e-10):
+            return i, output
+        estimate = accelerator.update(estimate, output)
+    raise AssertionError("Did not converge")
+
+
+class TestAccelerators:
+
+    def test_plain(self):
+        accelerator = Accelerator()
+        output = np.array([1., 2.])
+        assert accelerator.update(np.zeros(2), output) is output
+
+    def test_relaxation(self):
+        accelerator = Relaxation(0.25)
+        actual = accelerator.update(np.array([1., 2.]), np.array([5., 2.]))
+        assert_allclose(actual, [2., 2.])
+
+    @mark.parametrize('accelerator', [Relaxation(1.0), Aitken(), Anderson(depth=3)])
+    def test_converges_to_fixed_point(self, accelerator, linear_problem):
+        _, actual = iterations_to_converge(accelerator, linear_problem)
+        assert_allclose(actual, np.ones(3))
+
+    @mark.parametrize('accelerator', [Aitken(), Anderson(depth=3)])
+    def test_fewer_iterations(self, accelerator, linear_problem):
+        plain, _ = iterations_to_converge(Accelerator(), linear_problem)
+        accelerated, _ = iterations_to_converge(accelerator, linear_problem)
+        assert accelerated < plain
+
+    def test_anderson_linear_exact(self, linear_problem):
+        """Anderson mixing with enough history solves a linear problem in at
+        most one more iteration than its dimension
+        """
+        iterations, _ = iterations_to_converge(Anderson(depth=5), linear_problem)
+        assert iterations <= 5
+
+    def test_reset(self, linear_problem):
+        accelerator = Aitken(0.5)
+        iterations_to_converge(accelerator, linear_problem)
+        accelerator.reset()
+        assert accelerator.factor == 0.5
+
+        accelerator = Anderson()
+        iterations_to_converge(accelerator, linear_problem)
+        accelerator.reset()
+        assert len(accelerator._history) == 0
+
+    def test_invalid_options(self):
+        with raises(ValueError):
+            Relaxation(0)
+        with raises(ValueError):
+            Anderson(depth=0)
+
+
+class TestGetAccelerator:
+
+    def test_by_name(self):
+        assert type(get_accelerator('none')) is Accelerator
+        assert get_accelerator('relaxation', factor=0.3).factor == 0.3
+        assert isinstance(get_accelerator('aitken'), Aitken)
+        accelerator = get_accelerator('anderson', factor=0.5, depth=2)
+        assert (accelerator.factor, accelerator.depth) == (0.5, 2)
+
+    def test_unknown(self):
+        with raises(ValueError) as ex:
+            get_accelerator('newton')
+        assert "not 'newton'" in str(ex.value)
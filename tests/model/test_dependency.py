@@ -0,0 +1,140 @@
+import numpy as np
+from pytest import raises
+from smif.metadata import Metadata
+from smif.model.dependency import Dependency
+from smif.model.scenario_model import ScenarioModel
+
+
+def get_dependency(regions, intervals, units='kWh', aggregation='sum'):
+    scenario = ScenarioModel('electricity_demand_scenario')
+    scenario.add_output('electricity_demand',
+                        scenario.regions.get_entry(regions),
+                        scenario.intervals.get_entry(intervals),
+                        units,
+                        aggregation)
+    return Dependency(scenario, scenario.model_outputs['electricity_demand'])
+
+
+class TestDependencyConvert:
+
+    def test_convert_space_and_time(self):
+        dependency = get_dependency('half_squares', 'months')
+        sink = Metadata('electricity_demand_input',
+                        dependency.source_model.regions.get_entry('rect'),
+                        dependency.source_model.intervals.get_entry('seasons'),
+                        'kWh')
+
+        data = np.ones((2, 12)) / 2
+        actual = dependency.convert(data, sink)
+        expected = np.ones((1, 4)) * 3
+        np.testing.assert_allclose(actual, expected)
+
+    def test_operator_compiled_once(self):
+        dependency = get_dependency('half_squares', 'months')
+        sink = Metadata('electricity_demand_input',
+                        dependency.source_model.regions.get_entry('rect'),
+                        dependency.source_model.intervals.get_entry('seasons'),
+                        'kWh')
+
+        dependency.convert(np.ones((2, 12)), sink)
+        operator = list(dependency._operators.values())[0]
+        dependency.convert(np.ones((2, 12)) * 2, sink)
+
+        assert len(dependency._operators) == 1
+        assert list(dependency._operators.values())[0] is operator
+
+    def test_operator_source_changed(self):
+        """A change to the source metadata should compile a new operator
+        """
+        dependency = get_dependency('half_squares', 'months', units='kWh')
+        sink = Metadata('electricity_demand_input',
+                        dependency.source.spatial_resolution,
+                        dependency.source.temporal_resolution,
+                        'kWh')
+        data = np.ones((2, 12)) * 1000
+        np.testing.assert_allclose(dependency.convert(data, sink), data)
+
+        dependency.source.units = 'MWh'
+        np.testing.assert_allclose(dependency.convert(data, sink), data * 1000)
+
+        dependency.source.aggregation = 'mean'
+        with raises(ValueError):
+            dependency.convert(data, sink)
+        assert len(dependency._operators) == 2
+
+    def test_convert_units(self):
+        dependency = get_dependency('half_squares', 'months', units='kWh')
+        sink = Metadata('electricity_demand_input',
+                        dependency.source_model.regions.get_entry('rect'),
+                        dependency.source_model.intervals.get_entry('seasons'),
+                        'GWh')
+
+        data = np.ones((2, 12)) / 2 * 1e6
+        actual = dependency.convert(data, sink)
+        np.testing.assert_allclose(actual, np.ones((1, 4)) * 3)
+
+    def test_convert_units_only(self):
+        dependency = get_dependency('half_squares', 'months', units='kWh')
+        sink = Metadata('electricity_demand_input',
+                        dependency.source.spatial_resolution,
+                        dependency.source.temporal_resolution,
+                        'MWh')
+
+        data = np.ones((2, 12)) * 1000
+        actual = dependency.convert(data, sink)
+        np.testing.assert_allclose(actual, np.ones((2, 12)))
+        np.testing.assert_equal(data, np.ones((2, 12)) * 1000)
+
+    def test_convert_incompatible_units(self):
+        dependency = get_dependency('half_squares', 'months', units='kWh')
+        sink = Metadata('electricity_demand_input',
+                        dependency.source.spatial_resolution,
+                        dependency.source.temporal_resolution,
+                        'm')
+
+        with raises(ValueError):
+            dependency.convert(np.ones((2, 12)), sink)
+
+    def test_pass_through(self):
+        dependency = get_dependency('half_squares', 'months')
+        sink = dependency.source
+
+        data = np.ones((2, 12))
+        actual = dependency.convert(data, sink)
+        assert actual is data
+
+
+class TestDependencyAggregation:
+
+    def get_sink(self, dependency, aggregation):
+        return Metadata('electricity_price',
+                        dependency.source_model.regions.get_entry('rect'),
+                        dependency.source_model.intervals.get_entry('seasons'),
+                        'kWh',
+                        aggregation)
+
+    def test_convert_mean(self):
+        dependency = get_dependency('half_squares', 'months', aggregation='mean')
+        sink = self.get_sink(dependency, 'mean')
+
+        data = np.ones((2, 12)) * 870
+        actual = dependency.convert(data, sink)
+        np.testing.assert_allclose(actual, np.ones((1, 4)) * 870)
+
+    def test_convert_max_min(self):
+        data = np.arange(24, dtype=float).reshape(2, 12)
+
+        dependency = get_dependency('half_squares', 'months', aggregation='max')
+        actual = dependency.convert(data, self.get_sink(dependency, 'max'))
+        np.testing.assert_equal(actual, np.array([[23, 16, 19, 22]]))
+
+        dependency = get_dependency('half_squares', 'months', aggregation='min')
+        actual = dependency.convert(data, self.get_sink(dependency, 'min'))
+        np.testing.assert_equal(actual, np.array([[0, 2, 5, 8]]))
+
+    def test_mismatched_aggregation(self):
+        dependency = get_dependency('half_squares', 'months', aggregation='mean')
+        sink = self.get_sink(dependency, 'sum')
+
+        with raises(ValueError):
+            dependency.convert(np.ones((2, 12)), sink)
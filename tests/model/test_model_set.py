@@ -1,7 +1,11 @@
 
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
 import numpy as np
-from pytest import fixture
-from smif.model.sos_model import ModelSet, SectorModel
+from pytest import fixture, mark, raises
+from smif.model.convergence import get_accelerator
+from smif.model.sos_model import ModelSet, SectorModel, SosModel
 
 
 @fixture(scope='function')
@@ -47,6 +51,54 @@ def get_sector_model_object(get_empty_sector_model):
     return sector_model
 
 
+class LinearModel(SectorModel):
+    """Outputs a linear function of its input, optionally waiting until the
+    other models sharing the barrier are running at the same time
+    """
+    def __init__(self, name, input_name, output_name, factor, offset):
+        super().__init__(name)
+        self.input_name = input_name
+        self.output_name = output_name
+        self.factor = factor
+        self.offset = offset
+        self.runs = 0
+        self.barrier = None
+
+    def initialise(self, initial_conditions):
+        pass
+
+    def simulate(self, timestep, data=None):
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        self.runs += 1
+        value = self.factor * data[self.input_name] + self.offset
+        return {self.name: {self.output_name: value}}
+
+    def extract_obj(self, results):
+        return 0
+
+
+@fixture(scope='function')
+def get_coupled_models():
+    """Two models each linearly dependent on the other, with the fixed point
+    supply = 1 / 0.19, demand = 0.9 / 0.19
+    """
+    supply = LinearModel('supply', 'demand', 'supply', 0.9, 1)
+    demand = LinearModel('demand', 'supply', 'demand', 0.9, 0)
+    for model in (supply, demand):
+        model.add_input(model.input_name,
+                        model.regions.get_entry('LSOA'),
+                        model.intervals.get_entry('annual'),
+                        'unit')
+        model.add_output(model.output_name,
+                         model.regions.get_entry('LSOA'),
+                         model.intervals.get_entry('annual'),
+                         'unit')
+    supply.add_dependency(demand, 'demand', 'demand')
+    demand.add_dependency(supply, 'supply', 'supply')
+    return supply, demand
+
+
 class TestModelSet:
 
     def test_guess_outputs_zero(self, get_sector_model_object):
@@ -55,7 +107,7 @@ class TestModelSet:
         ws_model = get_sector_model_object
         model_set = ModelSet([ws_model])
 
-        results = model_set.guess_results(ws_model, 2010, {})
+        results = model_set.guess_results(ws_model, 2010)
         expected = {
             "cost": np.zeros((1, 1)),
             "water": np.zeros((1, 1))
@@ -73,16 +125,42 @@ class TestModelSet:
             "water": np.array([[2.71]])
         }
 
-        # set up data as though from previous timestep simulation
-        data = {
-            2010: {
-                'water_supply': expected
-            },
-            2011: {}
-        }
+        # set up results as though from previous timestep simulation
+        model_set._set_solution(2010, {'water_supply': expected})
 
-        results = model_set.guess_results(ws_model, 2011, data)
+        results = model_set.guess_results(ws_model, 2011)
         assert results == expected
+        assert results['cost'] is not expected['cost']
+
+        # earlier timesteps only are used
+        assert model_set.guess_results(ws_model, 2010) == {
+            "cost": np.zeros((1, 1)),
+            "water": np.zeros((1, 1))
+        }
+
+    def test_guess_outputs_extrapolated(self, get_sector_model_object):
+        """If two previous timesteps have results, extrapolate linearly
+        """
+        ws_model = get_sector_model_object
+        model_set = ModelSet([ws_model], warm_start='extrapolate')
+
+        model_set._set_solution(2010, {'water_supply': {"cost": np.array([[1.]]),
+                                                        "water": np.array([[2.]])}})
+        assert model_set.guess_results(ws_model, 2015)['cost'] == np.array([[1.]])
+
+        model_set._set_solution(2015, {'water_supply': {"cost": np.array([[2.]]),
+                                                        "water": np.array([[2.]])}})
+        results = model_set.guess_results(ws_model, 2025)
+        assert results == {"cost": np.array([[4.]]), "water": np.array([[2.]])}
+
+    def test_guess_outputs_keeps_two_timesteps(self, get_sector_model_object):
+        ws_model = get_sector_model_object
+        model_set = ModelSet([ws_model], warm_start='zeros')
+        for timestep in [2010, 2015, 2020]:
+            model_set._set_solution(timestep, {'water_supply': {"cost": np.ones((1, 1)),
+                                                                "water": np.ones((1, 1))}})
+        assert sorted(model_set._solutions) == [2015, 2020]
+        assert model_set.guess_results(ws_model, 2025)['cost'] == np.zeros((1, 1))
 
     def test_converged_first_iteration(self, get_sector_model_object):
         """Should not report convergence after a single iteration
@@ -90,7 +168,7 @@ class TestModelSet:
         ws_model = get_sector_model_object
         model_set = ModelSet([ws_model])
 
-        results = model_set.guess_results(ws_model, 2010, {})
+        results = model_set.guess_results(ws_model, 2010)
         model_set.iterated_results = [{ws_model.name: results}]
 
         assert not model_set.converged()
@@ -101,7 +179,7 @@ class TestModelSet:
         ws_model = get_sector_model_object
         model_set = ModelSet([ws_model])
 
-        results = model_set.guess_results(ws_model, 2010, {})
+        results = model_set.guess_results(ws_model, 2010)
         model_set.iterated_results = [
             {
                 "water_supply": results
@@ -112,3 +190,214 @@ class TestModelSet:
         ]
 
         assert model_set.converged()
+
+    @mark.parametrize('accelerator,faster', [('relaxation', False),
+                                             ('aitken', True),
+                                             ('anderson', True)])
+    def test_accelerated_convergence(self, get_coupled_models, accelerator, faster):
+        """Accelerators should converge to the same solution, with Aitken and
+        Anderson taking fewer iterations than plain fixed-point iteration on
+        this monotone problem, which under-relaxation only slows
+        """
+        supply, demand = get_coupled_models
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             relative_tolerance=1e-08, absolute_tolerance=1e-10)
+        results = model_set.simulate(2010)
+        plain_runs = supply.runs
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]])
+
+        supply.runs = 0
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             relative_tolerance=1e-08, absolute_tolerance=1e-10,
+                             accelerator=get_accelerator(accelerator, factor=0.9))
+        results = model_set.simulate(2010)
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]])
+        np.testing.assert_allclose(results['demand']['demand'], [[0.9 / 0.19]])
+        assert (supply.runs < plain_runs) == faster
+
+    def test_gauss_seidel_convergence(self, get_coupled_models):
+        supply, demand = get_coupled_models
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             relative_tolerance=1e-08, absolute_tolerance=1e-10)
+        model_set.simulate(2010)
+        jacobi_runs = supply.runs
+
+        supply.runs = 0
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             relative_tolerance=1e-08, absolute_tolerance=1e-10,
+                             ordering='gauss_seidel')
+        results = model_set.simulate(2010)
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]])
+        np.testing.assert_allclose(results['demand']['demand'], [[0.9 / 0.19]])
+        assert supply.runs < jacobi_runs
+
+    def test_sweep_order(self, get_empty_sector_model):
+        """Models should run after as many of their providers as possible
+
+        a <- b, a <- c, b <- c, c <- a is best run as c, b, a
+        """
+        models = {}
+        for name in 'abc':
+            model = get_empty_sector_model(name)
+            model.add_input('input_' + name,
+                            model.regions.get_entry('LSOA'),
+                            model.intervals.get_entry('annual'),
+                            'unit')
+            model.add_input('other_input_' + name,
+                            model.regions.get_entry('LSOA'),
+                            model.intervals.get_entry('annual'),
+                            'unit')
+            model.add_output('output',
+                             model.regions.get_entry('LSOA'),
+                             model.intervals.get_entry('annual'),
+                             'unit')
+            models[name] = model
+        models['a'].add_dependency(models['b'], 'output', 'input_a')
+        models['a'].add_dependency(models['c'], 'output', 'other_input_a')
+        models['b'].add_dependency(models['c'], 'output', 'input_b')
+        models['c'].add_dependency(models['a'], 'output', 'input_c')
+
+        model_set = ModelSet([models['a'], models['b'], models['c']],
+                             ordering='gauss_seidel')
+        assert [model.name for model in model_set._sweep_order] == ['c', 'b', 'a']
+
+    def test_unknown_ordering(self, get_sector_model_object):
+        with raises(ValueError):
+            ModelSet([get_sector_model_object], ordering='random')
+
+    def test_concurrent_iteration(self, get_coupled_models):
+        """Models in a Jacobi iteration should run at the same time
+        """
+        supply, demand = get_coupled_models
+        supply.barrier = demand.barrier = Barrier(2)
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             relative_tolerance=1e-08, absolute_tolerance=1e-10,
+                             executor='thread')
+        results = model_set.simulate(2010)
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]])
+        np.testing.assert_allclose(results['demand']['demand'], [[0.9 / 0.19]])
+
+    def test_concurrent_iteration_processes(self, get_coupled_models):
+        supply, demand = get_coupled_models
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             relative_tolerance=1e-08, absolute_tolerance=1e-10,
+                             executor='process', max_workers=2)
+        results = model_set.simulate(2010)
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]])
+
+    def test_given_pool(self, get_coupled_models):
+        """A pool given by the caller is used for every timestep, and left
+        running
+        """
+        supply, demand = get_coupled_models
+        model_set = ModelSet([supply, demand], max_iterations=500, executor='thread')
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            model_set.pool = pool
+            assert model_set._start_pool() is pool
+            model_set.simulate(2010)
+            results = model_set.simulate(2011)
+            assert pool.submit(int).result() == 0
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]], rtol=1e-4)
+
+    def test_unknown_executor(self, get_sector_model_object):
+        with raises(ValueError):
+            ModelSet([get_sector_model_object], executor='cluster')
+
+    def test_bounded_history(self, get_coupled_models):
+        supply, demand = get_coupled_models
+        model_set = ModelSet([supply, demand], max_iterations=500)
+        model_set.simulate(2010)
+        assert len(model_set.iterated_results) == 2
+        assert supply.runs > 2
+
+        supply.runs = 0
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             full_history=True)
+        results = model_set.simulate(2010)
+        assert len(model_set.iterated_results) == supply.runs + 1
+        assert model_set.iterated_results[0]['supply']['supply'] == np.zeros((1, 1))
+        assert model_set.iterated_results[-1] is results
+
+    def test_buffers_reused(self, get_coupled_models):
+        """Iterations alternate between two sets of buffers, which are updated
+        in place, and results are copied out of them
+        """
+        supply, demand = get_coupled_models
+        model_set = ModelSet([supply, demand], max_iterations=500,
+                             accelerator=get_accelerator('anderson'))
+        first = model_set.simulate(2010)
+        buffers = [model_set._buffers[0]['supply']['supply'],
+                   model_set._buffers[1]['supply']['supply']]
+        assert {id(results['supply']['supply'])
+                for results in model_set.iterated_results} == set(map(id, buffers))
+
+        supply.offset = 2
+        second = model_set.simulate(2011)
+        assert model_set._buffers[0]['supply']['supply'] is buffers[0]
+        assert model_set._buffers[1]['supply']['supply'] is buffers[1]
+        assert first['supply']['supply'] is not buffers[0]
+        assert first['supply']['supply'] is not buffers[1]
+        np.testing.assert_allclose(first['supply']['supply'], [[1 / 0.19]], rtol=1e-4)
+        np.testing.assert_allclose(second['supply']['supply'], [[2 / 0.19]], rtol=1e-4)
+
+    def test_warm_start(self, get_coupled_models):
+        """Later timesteps should start from the earlier solution
+        """
+        supply, demand = get_coupled_models
+        model_set = ModelSet([supply, demand], max_iterations=500)
+        model_set.simulate(2010)
+        first_runs = supply.runs
+
+        supply.runs = 0
+        results = model_set.simulate(2011)
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]], rtol=1e-4)
+        assert supply.runs < first_runs
+
+    def test_warm_start_processes(self, get_coupled_models):
+        """Later timesteps should start from the earlier solution when the
+        models of a SosModel run in processes
+        """
+        supply, demand = get_coupled_models
+        sos_model = SosModel('coupled')
+        sos_model.add_model(supply)
+        sos_model.add_model(demand)
+        sos_model.max_iterations = 500
+        sos_model.convergence_full_history = True
+        sos_model.executor = 'process'
+
+        try:
+            sos_model.simulate(2010)
+            model_set = sos_model.get_execution_plan().steps[0].model
+            assert model_set.pool is sos_model._pools.sector
+            first_iterations = len(model_set.iterated_results)
+
+            results = sos_model.simulate(2011)
+        finally:
+            sos_model.close_workers()
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]], rtol=1e-4)
+        assert sorted(model_set._solutions) == [2010, 2011]
+        assert len(model_set.iterated_results) < first_iterations
+
+    def test_workers(self, get_coupled_models):
+        """Models within a set run in the worker processes hosting them
+        """
+        supply, demand = get_coupled_models
+        sos_model = SosModel('coupled')
+        sos_model.add_model(supply)
+        sos_model.add_model(demand)
+        sos_model.max_iterations = 500
+        sos_model.executor = 'worker'
+        try:
+            results = sos_model.simulate(2010)
+            model_set = sos_model.get_execution_plan().steps[0].model
+            assert sorted(model_set.workers) == ['demand', 'supply']
+            assert model_set.workers['supply'] is sos_model._workers['supply']
+        finally:
+            sos_model.close_workers()
+
+        np.testing.assert_allclose(results['supply']['supply'], [[1 / 0.19]], rtol=1e-4)
+        assert supply.runs == 0
+
+    def test_unknown_warm_start(self, get_sector_model_object):
+        with raises(ValueError):
+            ModelSet([get_sector_model_object], warm_start='random')
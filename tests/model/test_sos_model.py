@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import pickle
 from copy import copy
+from threading import Barrier
 from unittest.mock import Mock
 
 import numpy as np
@@ -205,6 +207,160 @@ def get_empty_sector_model():
     return EmptySectorModel
 
 
+class ConcurrentSectorModel(SectorModel):
+    """Doubles its input, optionally waiting until the other models sharing
+    the barrier are running at the same time
+    """
+    def __init__(self, name, barrier=None):
+        super().__init__(name)
+        self.barrier = barrier
+
+    def initialise(self, initial_conditions):
+        pass
+
+    def simulate(self, timestep, data=None):
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        return {self.name: {'water': data['input'] * 2}}
+
+    def extract_obj(self, results):
+        return 0
+
+
+def get_concurrent_sos_model(scenario_model, barrier=None):
+    """Three independent models depending on a scenario, and a fourth model
+    depending on one of them
+    """
+    sos_model = SosModel('concurrent_sos_model')
+    sos_model.add_model(scenario_model)
+    regions = scenario_model.regions.get_entry('LSOA')
+    intervals = scenario_model.intervals.get_entry('annual')
+
+    for name in ['water_a', 'water_b', 'water_c', 'water_d']:
+        model = ConcurrentSectorModel(name, barrier)
+        model.add_input('input', regions, intervals, 'ml')
+        model.add_output('water', regions, intervals, 'ml')
+        sos_model.add_model(model)
+
+    for name in ['water_a', 'water_b', 'water_c']:
+        sos_model.models[name].add_dependency(scenario_model, 'raininess', 'input')
+    sos_model.models['water_d'].barrier = None
+    sos_model.models['water_d'].add_dependency(sos_model.models['water_a'], 'water',
+                                               'input')
+    return sos_model
+
+
+class TestConcurrentSosModel():
+
+    def test_sequential_results(self, get_scenario_model_object):
+        sos_model = get_concurrent_sos_model(get_scenario_model_object)
+        results = sos_model.simulate(2010)
+
+        assert results['water_a']['water'] == np.array([[6.]])
+        assert results['water_d']['water'] == np.array([[12.]])
+
+    def test_threads(self, get_scenario_model_object):
+        # the barrier times out unless water_a, water_b and water_c run together
+        sos_model = get_concurrent_sos_model(get_scenario_model_object, Barrier(3))
+        sos_model.executor = 'thread'
+        sos_model.max_workers = 3
+        try:
+            results = sos_model.simulate(2010)
+        finally:
+            sos_model.close_workers()
+
+        assert sorted(results.keys()) == \
+            ['test_scenario_model', 'water_a', 'water_b', 'water_c', 'water_d']
+        assert results['water_c']['water'] == np.array([[6.]])
+        assert results['water_d']['water'] == np.array([[12.]])
+
+    def test_processes(self, get_scenario_model_object):
+        sos_model = get_concurrent_sos_model(get_scenario_model_object)
+        sos_model.executor = 'process'
+        sos_model.max_workers = 2
+        try:
+            results = sos_model.simulate(2011)
+        finally:
+            sos_model.close_workers()
+
+        assert results['water_b']['water'] == np.array([[10.]])
+        assert results['water_d']['water'] == np.array([[20.]])
+
+    def test_pools_kept(self, get_scenario_model_object):
+        """Pools are started once for the model run, and shut down with the
+        workers
+        """
+        sos_model = get_concurrent_sos_model(get_scenario_model_object)
+        sos_model.executor = 'process'
+        try:
+            sos_model.simulate(2010)
+            pools = sos_model._pools
+            assert pools.sector is pools.model_set
+            assert pools.local is not pools.sector
+
+            results = sos_model.simulate(2011)
+            assert sos_model._pools is pools
+            assert results['water_d']['water'] == np.array([[20.]])
+
+            sos_model.executor = 'thread'
+            sos_model.simulate(2012)
+            assert sos_model._pools is not pools
+            assert sos_model._pools.sector is sos_model._pools.local
+        finally:
+            sos_model.close_workers()
+        assert sos_model._pools is None
+        with raises(RuntimeError):
+            pools.sector.submit(int)
+
+    def test_pickled_model_size(self, get_scenario_model_object):
+        """Models sent to a process pool leave behind the registers and the
+        models upstream of them
+        """
+        sos_model = get_concurrent_sos_model(get_scenario_model_object)
+        model = sos_model.models['water_d']
+        size = len(pickle.dumps(model))
+        assert size < 4096
+
+        get_scenario_model_object.add_data(np.ones((1000, 1, 1)), list(range(1000)))
+        assert len(pickle.dumps(model)) == size
+
+        actual = pickle.loads(pickle.dumps(model))
+        assert actual.regions is model.regions
+        assert actual.deps['input'].source_model.name == 'water_a'
+        assert not isinstance(actual.deps['input'].source_model, SectorModel)
+        assert actual.model_inputs['input'].spatial_resolution is \
+            model.model_inputs['input'].spatial_resolution
+
+    def test_workers(self, get_scenario_model_object):
+        sos_model = get_concurrent_sos_model(get_scenario_model_object)
+        sos_model.executor = 'worker'
+        try:
+            results = sos_model.simulate(2010)
+            assert results['water_a']['water'] == np.array([[6.]])
+            assert results['water_d']['water'] == np.array([[12.]])
+
+            results = sos_model.simulate(2012)
+            assert results['water_d']['water'] == np.array([[4.]])
+            assert len(sos_model._workers) == 4
+        finally:
+            sos_model.close_workers()
+        assert sos_model._workers == {}
+
+    def test_model_set_executor(self):
+        sos_model = SosModel('test')
+        assert sos_model._get_model_set_executor() is None
+        sos_model.executor = 'process'
+        assert sos_model._get_model_set_executor() == 'process'
+        sos_model.executor = 'worker'
+        assert sos_model._get_model_set_executor() == 'thread'
+
+    def test_unknown_executor(self, get_scenario_model_object):
+        sos_model = get_concurrent_sos_model(get_scenario_model_object)
+        sos_model.executor = 'cluster'
+        with raises(ValueError):
+            sos_model.simulate(2010)
+
+
 class TestSosModelProperties():
 
     def test_model_inputs_property(self, get_sos_model_object):
@@ -386,6 +542,86 @@ class TestSosModel():
         sos_model.simulate(2011)
         sos_model.simulate(2012)
 
+    def test_run_order_cached(self, get_sos_model_object):
+        sos_model = get_sos_model_object
+        sos_model.simulate(2010)
+        run_order = sos_model._run_order
+        graph = sos_model.dependency_graph
+
+        sos_model.simulate(2011)
+        assert sos_model._run_order is run_order
+        assert sos_model.dependency_graph is graph
+
+    def test_run_order_invalidated(self, get_sos_model_object, get_empty_sector_model):
+        sos_model = get_sos_model_object
+        sos_model.simulate(2010)
+
+        # adding a model
+        model = get_empty_sector_model('other_model')
+        sos_model.add_model(model)
+        assert sos_model._run_order is None
+        sos_model.simulate(2010)
+        assert model in sos_model._run_order
+
+        # adding an input and dependency to a contained model
+        model.add_input('raininess',
+                        model.regions.get_entry('LSOA'),
+                        model.intervals.get_entry('annual'),
+                        'ml')
+        assert sos_model._run_order is None
+        with raises(NotImplementedError):
+            sos_model.simulate(2010)
+
+        model.add_dependency(sos_model.models['test_scenario_model'],
+                             'raininess', 'raininess')
+        assert sos_model._run_order is None
+        sos_model.simulate(2010)
+        assert sos_model.dependency_graph.has_edge(
+            sos_model.models['test_scenario_model'], model)
+
+    def test_run_order_settings_changed(self, get_sos_model_object):
+        sos_model = get_sos_model_object
+        sos_model.simulate(2010)
+        run_order = sos_model._run_order
+
+        sos_model.max_iterations = 10
+        sos_model.simulate(2010)
+        assert sos_model._run_order is not run_order
+
+    def test_execution_plan(self, get_sos_model_object):
+        sos_model = get_sos_model_object
+        plan = sos_model.get_execution_plan()
+
+        assert [step.name for step in plan] == ['test_scenario_model', 'water_supply']
+        assert plan.steps[0].providers == set()
+        assert plan.steps[1].providers == {0}
+
+        dep = sos_model.models['water_supply'].deps['raininess']
+        model_input = sos_model.models['water_supply'].model_inputs['raininess']
+        name, source_model, source, operator, external = plan.steps[1].inputs[0]
+        assert (name, source_model, source, external) == \
+            ('raininess', 'test_scenario_model', 'raininess', False)
+        assert operator is dep.get_operator(model_input)
+
+        assert sos_model.get_execution_plan() is plan
+
+    def test_execution_plan_invalidated(self, get_sos_model_object):
+        sos_model = get_sos_model_object
+        plan = sos_model.get_execution_plan()
+
+        sos_model.models['water_supply'].add_parameter({
+            'name': 'sector_model_param',
+            'description': 'Some meaningful text',
+            'absolute_range': (0, 100),
+            'suggested_range': (3, 10),
+            'default_value': 3,
+            'units': '%'})
+        assert sos_model._plan is None
+
+        actual = sos_model.get_execution_plan()
+        assert actual is not plan
+        assert actual.steps[1].defaults == {'sector_model_param': 3}
+
     @pytest.mark.xfail(reason="Summed dependencies not yet implemented")
     def test_dependency_aggregation(self, get_sos_model_with_summed_dependency):
         sos_model = get_sos_model_with_summed_dependency
@@ -622,6 +858,84 @@ class TestSosModelBuilderComponents():
         sos_model = builder.finish()
         assert sos_model.convergence_relative_tolerance == 0.1
 
+    def test_set_convergence_accelerator(self, get_sos_model_config):
+        config = get_sos_model_config
+        config['convergence_accelerator'] = 'anderson'
+        config['convergence_relaxation_factor'] = 0.8
+        config['convergence_anderson_depth'] = 3
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        sos_model = builder.finish()
+        assert sos_model.convergence_accelerator == 'anderson'
+
+        accelerator = sos_model._get_accelerator()
+        assert (accelerator.factor, accelerator.depth) == (0.8, 3)
+
+        config['convergence_accelerator'] = 'newton'
+        builder = SosModelBuilder()
+        with raises(ValueError):
+            builder.construct(config, [2010, 2011, 2012])
+
+    def test_set_convergence_ordering(self, get_sos_model_config):
+        config = get_sos_model_config
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        assert builder.finish().convergence_ordering == 'jacobi'
+
+        config['convergence_ordering'] = 'gauss_seidel'
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        assert builder.finish().convergence_ordering == 'gauss_seidel'
+
+        config['convergence_ordering'] = 'random'
+        builder = SosModelBuilder()
+        with raises(ValueError):
+            builder.construct(config, [2010, 2011, 2012])
+
+    def test_set_convergence_full_history(self, get_sos_model_config):
+        config = get_sos_model_config
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        assert builder.finish().convergence_full_history is False
+
+        config['convergence_full_history'] = True
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        assert builder.finish().convergence_full_history is True
+
+    def test_set_convergence_warm_start(self, get_sos_model_config):
+        config = get_sos_model_config
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        assert builder.finish().convergence_warm_start == 'previous'
+
+        config['convergence_warm_start'] = 'extrapolate'
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        assert builder.finish().convergence_warm_start == 'extrapolate'
+
+        config['convergence_warm_start'] = 'random'
+        builder = SosModelBuilder()
+        with raises(ValueError):
+            builder.construct(config, [2010, 2011, 2012])
+
+    def test_set_parallel_executor(self, get_sos_model_config):
+        """Test constructing from single dict config
+        """
+        config = get_sos_model_config
+        config['parallel_executor'] = 'thread'
+        config['parallel_workers'] = 4
+        builder = SosModelBuilder()
+        builder.construct(config, [2010, 2011, 2012])
+        sos_model = builder.finish()
+        assert sos_model.executor == 'thread'
+        assert sos_model.max_workers == 4
+
+        config['parallel_executor'] = 'cluster'
+        builder = SosModelBuilder()
+        with raises(ValueError):
+            builder.construct(config, [2010, 2011, 2012])
+
     def test_load_models(self):
         pass
 
@@ -1056,7 +1370,7 @@ class TestScenarioModel:
 
         scenario.model_outputs['raininess'].units = 'incompatible'
 
-        with raises(NotImplementedError) as ex:
+        with raises(ValueError) as ex:
             sos_model.simulate(2010)
 
-        assert "Units conversion not implemented" in str(ex.value)
+        assert "Cannot convert from incompatible to milliliter" in str(ex.value)
@@ -0,0 +1,100 @@
+"""Test running sector models in worker processes
+"""
+import numpy as np
+from pytest import fixture, raises
+from smif.model import worker as worker_module
+from smif.model.sector_model import SectorModel
+from smif.model.worker import SectorModelWorker, start_process_pool
+
+
+class CountingSectorModel(SectorModel):
+    """Doubles its input and counts the number of times it has run
+    """
+    def initialise(self, initial_conditions):
+        self.runs = 0
+
+    def simulate(self, timestep, data=None):
+        if data['input'] is None:
+            raise ValueError("Missing input")
+        self.runs += 1
+        return {self.name: {'water': data['input'] * 2,
+                            'runs': self.runs,
+                            'scale': data['scale']}}
+
+    def extract_obj(self, results):
+        return 0
+
+
+@fixture(scope='function')
+def worker():
+    model = CountingSectorModel('water_supply')
+    model.initialise([])
+    model.add_input('input',
+                    model.regions.get_entry('half_squares'),
+                    model.intervals.get_entry('months'),
+                    'ml')
+    model.add_output('water',
+                     model.regions.get_entry('half_squares'),
+                     model.intervals.get_entry('months'),
+                     'ml')
+    worker = SectorModelWorker(model)
+    yield worker
+    worker.close()
+
+
+class TestSectorModelWorker:
+
+    def test_simulate(self, worker):
+        data = np.arange(24, dtype=float).reshape(2, 12)
+        results = worker.simulate(2010, {'input': data, 'scale': 1})
+
+        np.testing.assert_equal(results['water_supply']['water'], data * 2)
+        assert results['water_supply']['scale'] == 1
+        np.testing.assert_equal(data, np.arange(24).reshape(2, 12))
+
+    def test_state_persists(self, worker):
+        data = np.ones((2, 12))
+        first = worker.simulate(2010, {'input': data, 'scale': 1})
+        second = worker.simulate(2011, {'input': data * 3, 'scale': 1})
+
+        assert first['water_supply']['runs'] == 1
+        assert second['water_supply']['runs'] == 2
+        # outputs are copied out of the reused shared block
+        np.testing.assert_equal(first['water_supply']['water'], np.ones((2, 12)) * 2)
+        np.testing.assert_equal(second['water_supply']['water'], np.ones((2, 12)) * 6)
+
+    def test_input_shape_changes(self, worker):
+        worker.simulate(2010, {'input': np.ones((2, 12)), 'scale': 1})
+        results = worker.simulate(2011, {'input': np.ones(3, dtype=int), 'scale': 1})
+        np.testing.assert_equal(results['water_supply']['water'], [2, 2, 2])
+
+    def test_error(self, worker):
+        with raises(RuntimeError) as ex:
+            worker.simulate(2010, {'input': None, 'scale': 1})
+        assert "Missing input" in str(ex.value)
+
+        results = worker.simulate(2010, {'input': np.ones((2, 12)), 'scale': 1})
+        assert results['water_supply']['runs'] == 1
+
+    def test_unavailable(self, monkeypatch):
+        monkeypatch.setattr(worker_module, 'SharedMemory', None)
+        with raises(RuntimeError) as ex:
+            SectorModelWorker(CountingSectorModel('water_supply'))
+        assert "Python 3.8" in str(ex.value)
+
+        monkeypatch.setattr(worker_module.multiprocessing, 'get_all_start_methods',
+                            lambda: ['spawn'])
+        with raises(RuntimeError) as ex:
+            SectorModelWorker(CountingSectorModel('water_supply'))
+        assert "'fork'" in str(ex.value)
+
+
+def test_start_process_pool(monkeypatch):
+    with start_process_pool(max_workers=2) as pool:
+        assert list(pool.map(abs, [-1, 2])) == [1, 2]
+
+    monkeypatch.setattr(worker_module.multiprocessing, 'get_all_start_methods',
+                        lambda: ['spawn'])
+    with raises(RuntimeError) as ex:
+        start_process_pool()
+    assert "'fork'" in str(ex.value)
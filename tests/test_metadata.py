@@ -93,6 +93,20 @@ class TestMetadata(object):
         other = Metadata("total_lane_kilometres", region_set, interval_set, "kilometer")
         assert one_m == other
 
+    def test_aggregation(self):
+        """Expect aggregation to default to sum and reject unknown kinds
+        """
+        metadata = Metadata("total_lane_kilometres", region_set, interval_set, "kilometer")
+        assert metadata.aggregation == 'sum'
+
+        metadata = Metadata("fuel_price", region_set, interval_set, "GBP", 'mean')
+        assert metadata.aggregation == 'mean'
+        assert metadata != Metadata("fuel_price", region_set, interval_set, "GBP")
+
+        with raises(ValueError) as ex:
+            Metadata("fuel_price", region_set, interval_set, "GBP", 'median')
+        assert "Aggregation 'median' of fuel_price" in str(ex)
+
     def test_unit_normalisation(self):
         """Expect units to be set to full names from abbreviation
         """
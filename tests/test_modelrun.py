@@ -152,6 +152,16 @@ class TestModelRunBuilder:
         assert modelrun.strategies is None
         assert modelrun.narratives is None
 
+    def test_conversion_cache(self, tmpdir):
+
+        builder = ModelRunBuilder()
+        try:
+            builder.set_conversion_cache(str(tmpdir))
+            assert builder.model_run.regions.cache_dir == str(tmpdir)
+            assert builder.model_run.intervals.cache_dir == str(tmpdir)
+        finally:
+            builder.set_conversion_cache(None)
+
 
 class TestModelRun:
 